@@ -1,14 +1,16 @@
-from flask import Flask, request, jsonify
-import pandas as pd
-import numpy as np
+from flask import Flask, request, jsonify, g, Response
 from catboost import CatBoostClassifier
 import re
-from urllib.parse import urlparse
-import math
-from collections import Counter
-import string
 import logging
 import os
+import json
+import threading
+import time
+
+from classifier_protocol import parse_fields, select_fields
+from metrics import CONTENT_TYPE, Registry, SharedMetrics
+from profiling import SampledProfiler, StageTimer
+from url_features import REQUIRED_FEATURES, THRESHOLD, extract_url_features, features_to_matrix
 
 # 로그 디렉토리 설정
 LOG_DIR = os.environ.get('LOG_DIR', os.path.expanduser('~/url_classifier/logs'))
@@ -29,6 +31,33 @@ app = Flask(__name__)
 model = None
 model_path = os.path.join(os.getcwd(), 'model', 'catboost_url_model.cbm')
 
+# 배치 요청당 최대 URL 수
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1024'))
+
+# 다중 작업자 실행 시 작업자별 준비 표시 파일 디렉토리 (gunicorn.conf.py 에서 설정)
+WORKER_READY_DIR = os.environ.get('WORKER_READY_DIR')
+EXPECTED_WORKERS = int(os.environ.get('GUNICORN_WORKERS', '1'))
+
+# /metrics 지표 (gunicorn 다중 작업자에서는 METRICS_DIR 에 작업자별로 기록한 값을 합쳐서 출력)
+METRICS = Registry()
+REQUESTS_TOTAL = METRICS.counter('classifier_requests_total', '엔드포인트 / 상태 코드별 요청 수', ('endpoint', 'status'))
+REQUEST_SECONDS = METRICS.histogram('classifier_request_seconds', '엔드포인트별 요청 처리 시간', ('endpoint',))
+URLS_TOTAL = METRICS.counter('classifier_urls_total', '분류한 URL 수 (결과별)', ('verdict',))
+FEATURE_SECONDS = METRICS.histogram('classifier_feature_extraction_seconds', '요청별 특성 추출 시간')
+PREDICT_SECONDS = METRICS.histogram('classifier_predict_proba_seconds', '요청별 predict_proba 시간')
+IN_FLIGHT = METRICS.gauge('classifier_in_flight_requests', '처리 중인 요청 수')
+SHARED_METRICS = SharedMetrics(METRICS, os.environ.get('METRICS_DIR'))
+
+# 단계별 시간: Server-Timing 응답 헤더 여부 / 이 시간(ms) 이상 걸린 요청은 로그에 기록 (0: 기록 안 함)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '1000'))
+
+# 표본 프로파일링 (작업자별로 동작, /admin/profiling 으로 실행 중에 켜고 끌 수 있음)
+PROFILER = SampledProfiler('flask', LOG_DIR,
+                           sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+                           backend=os.environ.get('PROFILE_BACKEND', 'cprofile'),
+                           dump_every=int(os.environ.get('PROFILE_DUMP_EVERY', '100')))
+
 # 모델 로드 함수
 def load_model():
     global model
@@ -45,76 +74,68 @@ def load_model():
             raise
     return model
 
-# URL 특성 추출 함수
-def extract_url_features(url):
-    features = {}
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.timer = StageTimer()
+    g.profile = PROFILER.start()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    # 등록되지 않은 경로는 하나로 묶어 레이블 값이 늘어나지 않게 함
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'other'
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    
+    timer = g.get('timer')
+    if timer is not None:
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = timer.server_timing()
+        if SLOW_REQUEST_MS > 0 and timer.total() * 1000 >= SLOW_REQUEST_MS:
+            timings = timer.as_dict()
+            logger.warning(f"느린 요청 단계별 시간 (ms) - {endpoint}: {json.dumps(timings)}", extra={'timings': timings})
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    # 예외로 after_request 가 건너뛰어져도 처리 중 요청 수는 항상 줄임
+    if g.pop('request_started', None) is not None:
+        IN_FLIGHT.dec()
+    if PROFILER.finish(g.pop('profile', None)):
+        # 파일 쓰기는 요청 처리 스레드 밖에서
+        threading.Thread(target=PROFILER.dump, daemon=True).start()
+
+# Prometheus 형식 지표
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(SHARED_METRICS.render(), headers={'Content-Type': CONTENT_TYPE})
+
+# 프로파일링 상태 조회 / 설정 변경 (로컬 요청만, gunicorn 다중 작업자에서는 응답한 작업자에만 적용)
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': '로컬에서만 사용할 수 있습니다.'}), 403
+    if request.method == 'GET':
+        return jsonify(PROFILER.status())
+    
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON 객체가 필요합니다.'}), 400
     try:
-        # URL 길이
-        features['url_length'] = len(url)
-        
-        # URL
-        parsed_url = urlparse(url)
-        
-        # 경로 깊이
-        features['path_depth'] = url.count('/')
-        
-        # 특수문자 수
-        features['num_special_chars'] = sum(c in string.punctuation for c in url)
-        
-        # 특수문자 비율
-        features['special_chars_ratio'] = features['num_special_chars'] / max(features['url_length'], 1)
-        
-        # 숫자 수
-        features['num_digits'] = sum(c.isdigit() for c in url)
-        
-        # 숫자 비율
-        features['digits_ratio'] = features['num_digits'] / max(features['url_length'], 1)
-        
-        # 대문자 수
-        features['num_uppercase'] = sum(c.isupper() for c in url)
-        
-        # 대문자 비율
-        features['uppercase_ratio'] = features['num_uppercase'] / max(features['url_length'], 1)
-        
-        # 서브도메인 수
-        if parsed_url.netloc:
-            subdomain_parts = parsed_url.netloc.split('.')[:-2]
-            features['subdomain_count'] = len(subdomain_parts) if subdomain_parts else 0
-        else:
-            features['subdomain_count'] = 0
-        
-        # URL Shannon 엔트로피 계산 함수
-        def entropy(string_value):
-            counter = Counter(string_value)
-            length = len(string_value)
-            if length <= 1:
-                return 0
-            return -sum((count / length) * math.log2(count / length) for count in counter.values())
-        
-        # URL 엔트로피
-        features['url_entropy'] = entropy(url)
-        
-        # 하이픈 수
-        features['hyphen_count'] = url.count('-')
-        
-        # suspicious_tld (의심스러운 최상위 도메인)
-        suspicious_tlds = ['xyz', 'top', 'club', 'online', 'site', 'info', 'biz', 'cn', 'ru', 'tk']
-        tld = parsed_url.netloc.split('.')[-1] if '.' in parsed_url.netloc else ''
-        features['suspicious_tld'] = 1 if tld.lower() in suspicious_tlds else 0
-        
-        # login 키워드 포함 여부
-        features['has_login'] = 1 if 'login' in url.lower() else 0
-        
-    except Exception as e:
-        logger.error(f"특성 추출 중 오류: {e}")
-        # 기본값으로 채우기
-        for key in ['url_length', 'path_depth', 'num_special_chars', 'special_chars_ratio',
-                   'num_digits', 'digits_ratio', 'num_uppercase', 'uppercase_ratio',
-                   'subdomain_count', 'url_entropy', 'hyphen_count', 'suspicious_tld', 'has_login']:
-            if key not in features:
-                features[key] = 0
+        sample_rate = data.get('sample_rate')
+        status = PROFILER.configure(sample_rate=float(sample_rate) if sample_rate is not None else None,
+                                    backend=data.get('backend'))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
     
-    return features
+    if data.get('dump'):
+        path = PROFILER.dump()
+        status = PROFILER.status()
+        status['dumped'] = path
+    return jsonify(status)
 
 # API 상태 확인
 @app.route('/health', methods=['GET'])
@@ -126,6 +147,54 @@ def health_check():
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
+def mark_worker_ready():
+    """현재 작업자가 모델을 메모리에 올렸음을 표시"""
+    if WORKER_READY_DIR:
+        os.makedirs(WORKER_READY_DIR, exist_ok=True)
+        open(os.path.join(WORKER_READY_DIR, str(os.getpid())), 'w').close()
+
+def clear_worker_ready(pid):
+    if WORKER_READY_DIR:
+        try:
+            os.remove(os.path.join(WORKER_READY_DIR, str(pid)))
+        except OSError:
+            pass
+
+def count_ready_workers():
+    """준비 표시 파일 중 실제로 살아 있는 작업자 수 (강제 종료된 작업자의 파일은 정리)"""
+    ready = 0
+    for name in os.listdir(WORKER_READY_DIR):
+        try:
+            os.kill(int(name), 0)
+            ready += 1
+        except (ValueError, ProcessLookupError):
+            clear_worker_ready(name)
+        except PermissionError:
+            ready += 1
+    return ready
+
+# 준비 상태 확인 (모든 작업자가 모델을 로드했을 때만 200)
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    if model is None:
+        return jsonify({'status': 'not ready', 'model_loaded': False}), 503
+    
+    # 단일 프로세스 실행 (python app.py)
+    if not WORKER_READY_DIR:
+        return jsonify({'status': 'ready', 'model_loaded': True})
+    
+    try:
+        ready_workers = count_ready_workers()
+    except OSError as e:
+        return jsonify({'status': 'not ready', 'error': str(e)}), 503
+    
+    result = {'ready_workers': ready_workers, 'expected_workers': EXPECTED_WORKERS}
+    if ready_workers < EXPECTED_WORKERS:
+        result['status'] = 'not ready'
+        return jsonify(result), 503
+    result['status'] = 'ready'
+    return jsonify(result)
+
 # URL 예측
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -134,6 +203,12 @@ def predict():
         if model is None:
             load_model()
         
+        # 응답 항목 선택 (?fields=is_malicious,probability 이면 features 등 생략)
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # 요청 데이터 가져오기
         data = request.get_json(force=True)
         url = data.get('url', '')
@@ -141,31 +216,16 @@ def predict():
         if not url:
             return jsonify({'error': 'URL이 제공되지 않았습니다.'}), 400
         
-        # URL 특성 추출
-        features = extract_url_features(url)
-        
-        # 모델 입력을 위한 데이터프레임 생성
-        df = pd.DataFrame([features])
-        
-        # 필요한 특성만 선택 및 순서 맞추기
-        required_features = [
-            'url_entropy', 'num_special_chars', 'url_length', 'path_depth', 
-            'digits_ratio', 'num_digits', 'subdomain_count', 'special_chars_ratio',
-            'hyphen_count', 'suspicious_tld', 'num_uppercase', 'uppercase_ratio', 
-            'has_login'
-        ]
-        
-        # 누락된 특성에 대해 0 값 채우기
-        for feature in required_features:
-            if feature not in df.columns:
-                df[feature] = 0
-        
-        # 모델 입력 순서에 맞게 재정렬
-        df = df[required_features]
+        # URL 특성 추출 및 모델 입력 순서에 맞춘 1행 행렬 생성
+        with g.timer.stage('features', FEATURE_SECONDS):
+            features = extract_url_features(url)
+            X = features_to_matrix([features])
         
         # 예측
-        prediction = model.predict_proba(df)[0, 1]  # 악성 URL일 확률
-        is_malicious = prediction > 0.5  # 임계값 0.5
+        with g.timer.stage('predict', PREDICT_SECONDS):
+            prediction = model.predict_proba(X)[0, 1]  # 악성 URL일 확률
+        is_malicious = prediction > THRESHOLD  # 임계값 0.5
+        URLS_TOTAL.inc(verdict='malicious' if is_malicious else 'benign')
         
         # 로깅
         logger.info(f"URL 분석: {url} - 악성 확률: {prediction:.4f}")
@@ -178,17 +238,71 @@ def predict():
             'features': features
         }
         
-        return jsonify(result)
+        return jsonify(select_fields(result, fields))
         
     except Exception as e:
         logger.error(f"예측 중 오류: {e}")
         return jsonify({'error': str(e)}), 500
 
+# URL 일괄 예측
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    try:
+        if model is None:
+            load_model()
+        
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        data = request.get_json(force=True)
+        urls = data.get('urls') if isinstance(data, dict) else None
+        
+        if not isinstance(urls, list) or not urls:
+            return jsonify({'error': 'URL 목록이 제공되지 않았습니다.'}), 400
+        if len(urls) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'한 번에 최대 {MAX_BATCH_SIZE}개의 URL만 요청할 수 있습니다.'}), 400
+        if not all(isinstance(url, str) and url for url in urls):
+            return jsonify({'error': '비어 있거나 잘못된 URL이 포함되어 있습니다.'}), 400
+        
+        # 전체 URL에 대해 한 번의 predict_proba 호출 (features 를 요청한 경우에만 특성 보관)
+        with_features = fields is not None and 'features' in fields
+        with g.timer.stage('features', FEATURE_SECONDS):
+            feature_dicts = [extract_url_features(url) for url in urls]
+            matrix = features_to_matrix(feature_dicts)
+        with g.timer.stage('predict', PREDICT_SECONDS):
+            probabilities = model.predict_proba(matrix)[:, 1]
+        
+        # 요청 순서대로 결과 구성
+        results = []
+        malicious_count = 0
+        for url, features, prediction in zip(urls, feature_dicts, probabilities):
+            result = {
+                'url': url,
+                'is_malicious': bool(prediction > THRESHOLD),
+                'probability': float(prediction)
+            }
+            if with_features:
+                result['features'] = features
+            malicious_count += result['is_malicious']
+            results.append(select_fields(result, fields))
+        
+        URLS_TOTAL.inc(malicious_count, verdict='malicious')
+        URLS_TOTAL.inc(len(urls) - malicious_count, verdict='benign')
+        logger.info(f"URL 일괄 분석: {len(urls)}건 - 악성 {malicious_count}건")
+        
+        return jsonify({'results': results})
+        
+    except Exception as e:
+        logger.error(f"일괄 예측 중 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
 
 if __name__ == '__main__':
     try:
         load_model()
-        logger.info("Flask 애플리케이션 시작")
+        logger.info("Flask 애플리케이션 시작 (개발 서버, 운영 환경은 gunicorn -c gunicorn.conf.py app:app)")
     except Exception as e:
         logger.error(f"애플리케이션 시작 실패: {e}")
         exit(1)
@@ -0,0 +1,131 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger('audit_log')
+
+class AuditLogWriter:
+    """차단 기록을 JSON 한 줄씩 파일에 쓰는 백그라운드 작성기 (proxy_server / suricata_monitor 공용)
+
+    write() 는 큐에 넣기만 하므로 이벤트 루프나 분류 스레드를 막지 않는다. 작성 스레드는
+    batch_size 개가 모이거나 flush_interval 이 지나면 한 번에 쓰고, 파일이 max_bytes 를 넘거나
+    날짜가 바뀌면 이름을 바꿔 보관한다 (compress 이면 보관 파일을 gzip 으로 압축).
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=256, max_bytes=100 * 1024 * 1024,
+                 rotate_daily=True, compress=False, max_queue=100000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._size = 0
+        self._day = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """기록 하나를 큐에 추가 (큐가 가득 차면 버리고 개수만 셈)"""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """남은 기록을 모두 쓰고 작성 스레드 종료"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self.dropped:
+            logger.warning(f"차단 로그 큐가 가득 차서 버린 기록: {self.dropped}건")
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                record = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                if record is None:
+                    running = False
+                else:
+                    pending.append(record)
+            except queue.Empty:
+                pass
+
+            if pending and (not running or len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+        self._close_file()
+
+    def _flush(self, records):
+        try:
+            # 회전 크기는 파일에 쓰이는 바이트 수로 계산
+            data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+            self._rotate_if_needed(len(data))
+            if self._file is None:
+                self._open_file()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+        except Exception as e:
+            logger.error(f"차단 로그 쓰기 중 오류: {e}")
+            self._close_file()
+
+    def _open_file(self):
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+        self._day = datetime.fromtimestamp(os.fstat(self._file.fileno()).st_mtime).date() if self._size else datetime.now().date()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate_if_needed(self, incoming):
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return
+            self._open_file()
+
+        today = datetime.now().date()
+        too_big = self.max_bytes and self._size and self._size + incoming > self.max_bytes
+        new_day = self.rotate_daily and self._day != today
+        if not (too_big or new_day):
+            return
+
+        self._close_file()
+        rotated_path = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rotated_path) or os.path.exists(rotated_path + '.gz'):
+            rotated_path = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        os.replace(self.path, rotated_path)
+        logger.info(f"차단 로그 회전: {rotated_path}")
+
+        if self.compress:
+            with open(rotated_path, 'rb') as src, gzip.open(rotated_path + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated_path)
@@ -0,0 +1,293 @@
+"""프록시 / 모니터와 분류 서비스 사이의 길이 접두 바이너리 프로토콜
+
+한 연결에서 여러 요청을 응답을 기다리지 않고 이어서 보낼 수 있으며(파이프라이닝),
+응답은 요청 ID 로 짝을 맞춘다. 응답에는 URL 이나 특성 없이 URL 순서대로
+(확률, 악성 여부) 만 담긴다.
+
+프레임 (네트워크 바이트 순서):
+    헤더   : 본문 길이(uint32) / 요청 ID(uint32) / 상태(uint8) / 항목 수(uint16)
+    요청 본문: 항목 수만큼 [URL 길이(uint16) + UTF-8 URL]
+    응답 본문: 항목 수만큼 [확률(float64) + 악성 여부(uint8)]
+
+상태 값은 요청에서는 항상 STATUS_OK 이고, 응답에서 STATUS_OVERLOADED / STATUS_ERROR 이면
+본문이 비어 있다.
+"""
+import asyncio
+import itertools
+import logging
+import socket
+import struct
+import threading
+
+logger = logging.getLogger('classifier_protocol')
+
+HEADER = struct.Struct('!IIBH')
+URL_LENGTH = struct.Struct('!H')
+VERDICT = struct.Struct('!dB')
+
+STATUS_OK = 0
+STATUS_OVERLOADED = 1
+STATUS_ERROR = 2
+
+MAX_URLS_PER_FRAME = 0xFFFF
+MAX_URL_BYTES = 0xFFFF
+
+# 비정상적으로 큰 프레임은 연결 오류로 처리 (URL 최대 개수 x 최대 길이)
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+# /predict 응답에서 fields 옵션으로 고를 수 있는 항목
+RESPONSE_FIELDS = ('url', 'is_malicious', 'probability', 'features')
+
+class ProtocolError(Exception):
+    pass
+
+def parse_fields(value):
+    """?fields=is_malicious,probability 값을 응답 항목 집합으로 변환 (없으면 None = 전체)"""
+    if not value:
+        return None
+    fields = set(field.strip() for field in value.split(',') if field.strip())
+    unknown = fields.difference(RESPONSE_FIELDS)
+    if unknown:
+        raise ValueError(f"알 수 없는 응답 항목: {', '.join(sorted(unknown))}")
+    return fields
+
+def select_fields(result, fields):
+    """응답 딕셔너리에서 요청한 항목만 남김"""
+    if fields is None:
+        return result
+    return {key: value for key, value in result.items() if key in fields}
+
+def parse_address(address):
+    """'unix:/path/to.sock' 또는 'host:port' 를 (family, 주소) 로 변환"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[5:]
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"잘못된 분류 서비스 주소: {address}")
+    return socket.AF_INET, (host.strip('[]'), int(port))
+
+def encode_request(request_id, urls):
+    """URL 목록을 요청 프레임으로 변환"""
+    if len(urls) > MAX_URLS_PER_FRAME:
+        raise ValueError(f"한 프레임에 최대 {MAX_URLS_PER_FRAME}개의 URL만 보낼 수 있습니다.")
+    parts = []
+    for url in urls:
+        data = url.encode('utf-8', 'surrogatepass')[:MAX_URL_BYTES]
+        parts.append(URL_LENGTH.pack(len(data)))
+        parts.append(data)
+    body = b''.join(parts)
+    return HEADER.pack(len(body), request_id, STATUS_OK, len(urls)) + body
+
+def decode_request_body(body, count):
+    urls = []
+    offset = 0
+    for _ in range(count):
+        try:
+            (length,) = URL_LENGTH.unpack_from(body, offset)
+        except struct.error:
+            raise ProtocolError("요청 본문이 URL 길이 필드 중간에서 끝났습니다.")
+        offset += URL_LENGTH.size
+        urls.append(body[offset:offset + length].decode('utf-8', 'replace'))
+        offset += length
+    if offset != len(body):
+        raise ProtocolError("요청 본문 길이가 항목 수와 맞지 않습니다.")
+    return urls
+
+def encode_response(request_id, verdicts, status=STATUS_OK):
+    """(확률, 악성 여부) 목록을 응답 프레임으로 변환"""
+    if status != STATUS_OK:
+        return HEADER.pack(0, request_id, status, 0)
+    body = b''.join(VERDICT.pack(probability, 1 if is_malicious else 0)
+                    for probability, is_malicious in verdicts)
+    return HEADER.pack(len(body), request_id, status, len(verdicts)) + body
+
+def decode_response_body(body, count):
+    """응답 본문을 proxy 의 분류 결과 형식 [(악성 여부, 확률), ...] 으로 변환"""
+    if len(body) != count * VERDICT.size:
+        raise ProtocolError("응답 본문 길이가 항목 수와 맞지 않습니다.")
+    verdicts = []
+    for offset in range(0, len(body), VERDICT.size):
+        probability, is_malicious = VERDICT.unpack_from(body, offset)
+        verdicts.append((bool(is_malicious), probability))
+    return verdicts
+
+def check_frame_length(length):
+    if length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"프레임이 너무 큽니다: {length} bytes")
+
+async def read_frame(reader):
+    """스트림에서 프레임 하나를 읽어 (요청 ID, 상태, 항목 수, 본문) 반환 (연결 종료 시 None)"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("프레임 헤더를 읽는 중 연결이 끊겼습니다.")
+        return None
+    length, request_id, status, count = HEADER.unpack(header)
+    check_frame_length(length)
+    try:
+        body = await reader.readexactly(length) if length else b''
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("프레임 본문을 읽는 중 연결이 끊겼습니다.")
+    return request_id, status, count, body
+
+async def open_connection(address):
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        return await asyncio.open_unix_connection(target)
+    return await asyncio.open_connection(*target)
+
+class AsyncClassifierClient:
+    """하나의 지속 연결로 요청을 파이프라이닝하는 비동기 클라이언트 (proxy_server 용)
+
+    classify() 는 실패하면 None 을 반환하므로 URLCheckCoalescer 의 일괄 분류 함수로 그대로 쓸 수 있다.
+    """
+
+    def __init__(self, address, timeout=5.0):
+        self.address = address
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    async def _ensure_connected(self):
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            # 응답 대기 목록은 연결마다 따로 두어 이전 연결의 정리가 새 연결의 요청에 닿지 않게 함
+            self._reader, self._writer = await open_connection(self.address)
+            self._pending = {}
+            self._read_task = asyncio.ensure_future(self._read_loop(self._reader, self._writer, self._pending))
+            logger.info(f"분류 서비스 연결: {self.address}")
+
+    async def _read_loop(self, reader, writer, pending):
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                request_id, status, count, body = frame
+                future = pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if status == STATUS_OK:
+                    future.set_result(decode_response_body(body, count))
+                else:
+                    future.set_result(None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"분류 서비스 응답 처리 중 오류: {e}")
+        finally:
+            self._fail_pending(writer, pending)
+
+    def _fail_pending(self, writer, pending):
+        # 연결이 끊기면 그 연결로 보낸 요청만 실패(None) 처리하고 다음 요청 때 다시 연결
+        for future in pending.values():
+            if not future.done():
+                future.set_result(None)
+        pending.clear()
+        writer.close()
+        if self._writer is writer:
+            self._reader = None
+            self._writer = None
+
+    async def classify(self, urls):
+        """URL 목록을 보내고 [(악성 여부, 확률), ...] 반환 (실패 시 None)"""
+        pending = None
+        request_id = None
+        try:
+            await self._ensure_connected()
+            writer, pending = self._writer, self._pending
+            request_id = next(self._ids) & 0xFFFFFFFF
+            future = asyncio.get_running_loop().create_future()
+            pending[request_id] = future
+            writer.write(encode_request(request_id, urls))
+            await writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        except Exception as e:
+            logger.error(f"분류 서비스 요청 실패 ({self.address}): {e!r}")
+            return None
+        finally:
+            # 시간 초과 등으로 응답을 기다리지 않게 된 요청은 대기 목록에서 바로 제거
+            if pending is not None:
+                pending.pop(request_id, None)
+
+    async def close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+        # 읽기 작업이 시작되기 전에 취소된 경우에도 연결을 정리
+        if self._writer is not None:
+            self._fail_pending(self._writer, self._pending)
+
+class ClassifierClient:
+    """스레드에서 사용하는 동기 클라이언트 (suricata_monitor 용, Python 3.6 호환)"""
+
+    def __init__(self, address, timeout=5.0):
+        self.address = address
+        self.timeout = timeout
+        self._sock = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        family, target = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(target)
+        except OSError:
+            sock.close()
+            raise
+        if family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+
+    def _recv_exactly(self, size):
+        chunks = []
+        while size:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                raise ProtocolError("분류 서비스 연결이 끊겼습니다.")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def classify(self, urls):
+        """URL 목록을 보내고 [(악성 여부, 확률), ...] 반환 (과부하 등 실패 응답이면 None)
+
+        연결 오류는 예외로 전달하며, 다음 호출에서 다시 연결한다.
+        """
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                request_id = next(self._ids) & 0xFFFFFFFF
+                self._sock.sendall(encode_request(request_id, urls))
+                while True:
+                    length, response_id, status, count = HEADER.unpack(self._recv_exactly(HEADER.size))
+                    check_frame_length(length)
+                    body = self._recv_exactly(length) if length else b''
+                    if response_id == request_id:
+                        break
+            except Exception:
+                self.close()
+                raise
+        if status != STATUS_OK:
+            return None
+        return decode_response_body(body, count)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
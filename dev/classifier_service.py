@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""비동기 URL 분류 서비스 (Flask app.py 와 같은 /predict, /predict_batch, /health API)
+
+HTTP 요청 수신은 aiohttp 이벤트 루프가 처리하고, 추론은 크기가 정해진 큐를 비우는
+고정 개수의 추론 스레드가 처리한다. 큐가 가득 차면 기다리게 하지 않고 바로
+503 + Retry-After 로 거절하여 부하가 몰려도 지연 시간이 한없이 늘어나지 않게 한다.
+
+classifier_protocol 의 길이 접두 바이너리 프로토콜로도 같은 추론 큐를 사용할 수 있다.
+(기본 주소는 proxy_server 의 --classifier-address 기본값과 같은 localhost:5002,
+--binary-address '' 로 끌 수 있음)
+
+사용 예:
+    python classifier_service.py --port 5001 --inference-threads 4 --queue-size 256
+    python classifier_service.py --binary-address unix:/tmp/url_classifier.sock
+"""
+import argparse
+import asyncio
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+from aiohttp import web
+from catboost import CatBoostClassifier
+
+import classifier_protocol
+from classifier_protocol import parse_fields, select_fields
+from metrics import CONTENT_TYPE, Registry
+from url_features import THRESHOLD, extract_url_features, features_to_matrix
+
+# 로그 디렉토리 설정
+LOG_DIR = os.environ.get('LOG_DIR', os.path.expanduser('~/url_classifier/logs'))
+os.makedirs(LOG_DIR, exist_ok=True)
+
+# 로깅 설정
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(LOG_DIR, 'classifier_service.log'))
+    ]
+)
+logger = logging.getLogger('classifier_service')
+
+MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(os.getcwd(), 'model', 'catboost_url_model.cbm'))
+
+# 배치 요청당 최대 URL 수
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1024'))
+
+class InferenceJob:
+    """추론 큐에 들어가는 요청 하나 (URL 목록과 결과를 받을 future)"""
+
+    __slots__ = ('urls', 'with_features', 'future', 'loop', 'enqueued_at')
+
+    def __init__(self, urls, with_features, future, loop):
+        self.urls = urls
+        self.with_features = with_features
+        self.future = future
+        self.loop = loop
+        self.enqueued_at = time.monotonic()
+
+class InferenceStats:
+    """큐 대기 시간 / 추론 시간 / 거절 수 집계 (추론 스레드와 이벤트 루프가 함께 갱신)
+
+    /stats 는 snapshot() 의 평균 / 최대값을, /metrics 는 같은 값을 카운터와 히스토그램으로 내보낸다.
+    """
+
+    def __init__(self, metrics):
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.inference_total = 0.0
+
+        for name, help_text in (('accepted', '추론 큐에 들어간 요청 수'),
+                                ('rejected', '큐가 가득 차서 거절한 요청 수'),
+                                ('completed', '추론을 마친 요청 수'),
+                                ('failed', '추론 중 오류가 난 요청 수'),
+                                ('batches', '추론 배치 수')):
+            metrics.counter(f'classifier_{name}_total', help_text).set_function(lambda name=name: getattr(self, name))
+        self.queue_wait_seconds = metrics.histogram('classifier_queue_wait_seconds', '요청별 추론 큐 대기 시간')
+        self.inference_seconds = metrics.histogram('classifier_inference_seconds', '배치별 추론 시간 (특성 추출 + 예측)')
+
+    def record_batch(self, waits, inference_time, failed=False):
+        with self._lock:
+            self.batches += 1
+            if failed:
+                self.failed += len(waits)
+            else:
+                self.completed += len(waits)
+            self.wait_total += sum(waits)
+            self.wait_max = max([self.wait_max] + waits)
+            self.inference_total += inference_time
+        for wait in waits:
+            self.queue_wait_seconds.observe(wait)
+        self.inference_seconds.observe(inference_time)
+
+    def record_accept(self):
+        with self._lock:
+            self.accepted += 1
+
+    def record_reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+                'batches': self.batches,
+                'avg_queue_wait_ms': round(self.wait_total / finished * 1000, 3) if finished else 0.0,
+                'max_queue_wait_ms': round(self.wait_max * 1000, 3),
+                'avg_inference_ms': round(self.inference_total / self.batches * 1000, 3) if self.batches else 0.0
+            }
+
+class InferencePool:
+    """크기가 정해진 큐를 고정 개수의 스레드가 비우면서 모아서 추론하는 풀
+
+    각 스레드는 작업 하나를 꺼낸 뒤 큐에 쌓여 있는 작업을 max_batch URL 까지 더 꺼내
+    predict_proba 한 번으로 처리한다. CatBoost 는 예측 중 GIL 을 해제하므로
+    스레드 수만큼 코어를 사용할 수 있다.
+    """
+
+    def __init__(self, model, threads=4, queue_size=256, max_batch=256, metrics=None):
+        self.model = model
+        self.threads = threads
+        self.max_batch = max_batch
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        metrics = metrics if metrics is not None else Registry()
+        self.stats = InferenceStats(metrics)
+        self.feature_seconds = metrics.histogram('classifier_feature_extraction_seconds', '배치별 특성 추출 시간')
+        self.predict_seconds = metrics.histogram('classifier_predict_proba_seconds', '배치별 predict_proba 시간')
+        self.batch_urls = metrics.histogram('classifier_batch_urls', '배치별 URL 수',
+                                            buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+        self._workers = []
+
+    def start(self):
+        for index in range(self.threads):
+            worker = threading.Thread(target=self._run, name=f"inference-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+    def submit(self, urls, with_features=False):
+        """작업을 큐에 넣고 future 반환 (큐가 가득 차면 queue.Full)"""
+        loop = asyncio.get_running_loop()
+        job = InferenceJob(urls, with_features, loop.create_future(), loop)
+        self.queue.put_nowait(job)
+        self.stats.record_accept()
+        return job.future
+
+    def _collect(self, first):
+        """첫 작업 뒤에 이미 쌓여 있는 작업들을 max_batch URL 까지 모음"""
+        jobs = [first]
+        size = len(first.urls)
+        while size < self.max_batch:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # 종료 표시는 다른 스레드를 위해 되돌려 놓음
+                self.queue.put(None)
+                break
+            jobs.append(job)
+            size += len(job.urls)
+        return jobs
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            jobs = self._collect(first)
+            started = time.monotonic()
+            waits = [started - job.enqueued_at for job in jobs]
+
+            try:
+                with self.feature_seconds.time():
+                    feature_lists = [[extract_url_features(url) for url in job.urls] for job in jobs]
+                    matrix = features_to_matrix([features for features_list in feature_lists for features in features_list])
+                with self.predict_seconds.time():
+                    probabilities = self.model.predict_proba(matrix)[:, 1]
+                self.batch_urls.observe(len(matrix))
+            except Exception as e:
+                logger.error(f"추론 중 오류: {e}")
+                self.stats.record_batch(waits, time.monotonic() - started, failed=True)
+                for job in jobs:
+                    job.loop.call_soon_threadsafe(_set_exception, job.future, e)
+                continue
+
+            self.stats.record_batch(waits, time.monotonic() - started)
+
+            # 요청별로 결과를 나누어 이벤트 루프에 전달
+            offset = 0
+            for job, features_list in zip(jobs, feature_lists):
+                results = []
+                for url, features in zip(job.urls, features_list):
+                    probability = float(probabilities[offset])
+                    offset += 1
+                    result = {'url': url, 'is_malicious': probability > THRESHOLD, 'probability': probability}
+                    if job.with_features:
+                        result['features'] = features
+                    results.append(result)
+                job.loop.call_soon_threadsafe(_set_result, job.future, results)
+
+def _set_result(future, result):
+    # 클라이언트 연결이 끊겨 취소된 요청은 무시
+    if not future.done():
+        future.set_result(result)
+
+def _set_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+class ClassifierService:
+    def __init__(self, host='0.0.0.0', port=5001, model_path=MODEL_PATH,
+                 inference_threads=4, queue_size=256, max_batch=256, retry_after=1, binary_address=None):
+        self.host = host
+        self.port = port
+        self.model_path = model_path
+        self.inference_threads = inference_threads
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.retry_after = retry_after
+        self.binary_address = binary_address
+        self.binary_server = None
+        self.pool = None
+
+        self.metrics = Registry()
+        self.metric_requests = self.metrics.counter('classifier_requests_total', '엔드포인트 / 상태 코드별 요청 수',
+                                                    ('endpoint', 'status'))
+        self.metric_request_seconds = self.metrics.histogram('classifier_request_seconds', '엔드포인트별 요청 처리 시간',
+                                                             ('endpoint',))
+        self.metric_in_flight = self.metrics.gauge('classifier_in_flight_requests', '처리 중인 요청 수')
+        self.metrics.gauge('classifier_queue_depth', '추론 큐에 쌓인 요청 수').set_function(
+            lambda: self.pool.queue.qsize() if self.pool is not None else 0)
+        self.metrics.gauge('classifier_queue_size', '추론 큐 크기').set_function(lambda: self.queue_size)
+
+        self.app = web.Application(middlewares=[self.metrics_middleware])
+        self.app.router.add_get('/health', self.handle_health)
+        self.app.router.add_get('/stats', self.handle_stats)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+        self.app.router.add_post('/predict', self.handle_predict)
+        self.app.router.add_post('/predict_batch', self.handle_predict_batch)
+        self.app.on_startup.append(self.start_pool)
+        self.app.on_startup.append(self.start_binary_server)
+        self.app.on_cleanup.append(self.stop_binary_server)
+        self.app.on_cleanup.append(self.stop_pool)
+
+    async def start_pool(self, app):
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"모델 파일을 찾을 수 없습니다: {self.model_path}")
+        model = CatBoostClassifier()
+        model.load_model(self.model_path)
+        logger.info(f"CatBoost 모델 로드 성공: {self.model_path}")
+
+        self.pool = InferencePool(model, threads=self.inference_threads,
+                                  queue_size=self.queue_size, max_batch=self.max_batch, metrics=self.metrics)
+        self.pool.start()
+        logger.info(f"추론 스레드 {self.inference_threads}개 시작 (큐 크기: {self.queue_size})")
+
+    async def stop_pool(self, app):
+        if self.pool is not None:
+            # 추론 스레드 종료 대기가 이벤트 루프를 막지 않도록 실행기에서 수행
+            await asyncio.get_running_loop().run_in_executor(None, self.pool.stop)
+            self.pool = None
+
+    @web.middleware
+    async def metrics_middleware(self, request, handler):
+        """HTTP 요청 수 / 처리 시간 집계"""
+        route = request.match_info.route.resource
+        # 등록되지 않은 경로는 하나로 묶어 레이블 값이 늘어나지 않게 함
+        endpoint = route.canonical if route is not None else 'other'
+        status = 500
+        started = time.perf_counter()
+        self.metric_in_flight.inc()
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            self.metric_in_flight.dec()
+            self.metric_requests.inc(endpoint=endpoint, status=status)
+            self.metric_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+
+    async def start_binary_server(self, app):
+        """바이너리 프로토콜 서버 시작 (--binary-address 를 지정한 경우)"""
+        if not self.binary_address:
+            return
+        family, target = classifier_protocol.parse_address(self.binary_address)
+        if family == socket.AF_UNIX:
+            # 이전 실행에서 남은 소켓 파일 제거
+            if os.path.exists(target):
+                os.remove(target)
+            self.binary_server = await asyncio.start_unix_server(self.handle_binary_connection, target)
+        else:
+            self.binary_server = await asyncio.start_server(self.handle_binary_connection, *target)
+        logger.info(f"바이너리 프로토콜 서버 시작 - {self.binary_address}")
+
+    async def stop_binary_server(self, app):
+        if self.binary_server is not None:
+            self.binary_server.close()
+            await self.binary_server.wait_closed()
+            self.binary_server = None
+
+    async def handle_binary_connection(self, reader, writer):
+        """연결 하나에서 파이프라이닝된 요청을 읽어 각각 추론 큐에 넣고 끝나는 순서대로 응답"""
+        tasks = set()
+        try:
+            while True:
+                frame = await classifier_protocol.read_frame(reader)
+                if frame is None:
+                    break
+                request_id, _, count, body = frame
+                if count > MAX_BATCH_SIZE:
+                    # JSON /predict_batch 와 같은 한도 (큰 프레임 하나가 추론 풀을 독점하지 않도록)
+                    logger.warning(f"바이너리 요청 URL 수 초과: {count}개 (최대 {MAX_BATCH_SIZE}개)")
+                    writer.write(classifier_protocol.encode_response(request_id, (),
+                                                                     classifier_protocol.STATUS_ERROR))
+                    continue
+                urls = classifier_protocol.decode_request_body(body, count)
+                task = asyncio.ensure_future(self.answer_binary_request(writer, request_id, urls))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (classifier_protocol.ProtocolError, ConnectionError) as e:
+            logger.warning(f"바이너리 프로토콜 연결 오류: {e}")
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def answer_binary_request(self, writer, request_id, urls):
+        status = classifier_protocol.STATUS_OK
+        verdicts = ()
+        try:
+            results = await self.classify(urls) if urls else []
+            if results is None:
+                status = classifier_protocol.STATUS_OVERLOADED
+            else:
+                verdicts = [(result['probability'], result['is_malicious']) for result in results]
+        except Exception as e:
+            logger.error(f"바이너리 요청 예측 중 오류: {e}")
+            status = classifier_protocol.STATUS_ERROR
+
+        if not writer.is_closing():
+            writer.write(classifier_protocol.encode_response(request_id, verdicts, status))
+            await writer.drain()
+
+    def overloaded_response(self):
+        """큐가 가득 찼을 때 즉시 반환하는 503 응답"""
+        return web.json_response(
+            {'error': '분류 요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도하세요.'},
+            status=503,
+            headers={'Retry-After': str(self.retry_after)}
+        )
+
+    async def classify(self, urls, with_features=False):
+        """추론 큐에 넣고 결과를 기다림 (큐가 가득 차면 None)"""
+        try:
+            future = self.pool.submit(urls, with_features)
+        except queue.Full:
+            self.pool.stats.record_reject()
+            return None
+        return await future
+
+    async def handle_health(self, request):
+        if self.pool is None:
+            return web.json_response({'status': 'unhealthy', 'model_loaded': False}, status=500)
+        return web.json_response({'status': 'healthy', 'model_loaded': True})
+
+    async def handle_stats(self, request):
+        stats = self.pool.stats.snapshot()
+        stats['queue_depth'] = self.pool.queue.qsize()
+        stats['queue_size'] = self.queue_size
+        stats['inference_threads'] = self.inference_threads
+        return web.json_response(stats)
+
+    async def handle_metrics(self, request):
+        """Prometheus 형식 지표 반환"""
+        return web.Response(body=self.metrics.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    async def read_json(self, request):
+        try:
+            return await request.json()
+        except ValueError:
+            return None
+
+    def parse_fields(self, request):
+        """?fields= 옵션 확인 (잘못된 값이면 ValueError)"""
+        return parse_fields(request.query.get('fields'))
+
+    async def handle_predict(self, request):
+        try:
+            fields = self.parse_fields(request)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        data = await self.read_json(request)
+        url = data.get('url', '') if isinstance(data, dict) else ''
+        if not isinstance(url, str) or not url:
+            return web.json_response({'error': 'URL이 제공되지 않았습니다.'}, status=400)
+
+        try:
+            with_features = fields is None or 'features' in fields
+            results = await self.classify([url], with_features=with_features)
+        except Exception as e:
+            logger.error(f"예측 중 오류: {e}")
+            return web.json_response({'error': str(e)}, status=500)
+        if results is None:
+            return self.overloaded_response()
+
+        result = results[0]
+        logger.info(f"URL 분석: {url} - 악성 확률: {result['probability']:.4f}")
+        return web.json_response(select_fields(result, fields))
+
+    async def handle_predict_batch(self, request):
+        try:
+            fields = self.parse_fields(request)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        data = await self.read_json(request)
+        urls = data.get('urls') if isinstance(data, dict) else None
+
+        if not isinstance(urls, list) or not urls:
+            return web.json_response({'error': 'URL 목록이 제공되지 않았습니다.'}, status=400)
+        if len(urls) > MAX_BATCH_SIZE:
+            return web.json_response({'error': f'한 번에 최대 {MAX_BATCH_SIZE}개의 URL만 요청할 수 있습니다.'}, status=400)
+        if not all(isinstance(url, str) and url for url in urls):
+            return web.json_response({'error': '비어 있거나 잘못된 URL이 포함되어 있습니다.'}, status=400)
+
+        try:
+            results = await self.classify(urls, with_features=fields is not None and 'features' in fields)
+        except Exception as e:
+            logger.error(f"일괄 예측 중 오류: {e}")
+            return web.json_response({'error': str(e)}, status=500)
+        if results is None:
+            return self.overloaded_response()
+
+        logger.info(f"URL 일괄 분석: {len(urls)}건 - 악성 {sum(r['is_malicious'] for r in results)}건")
+        return web.json_response({'results': [select_fields(result, fields) for result in results]})
+
+    def run(self):
+        logger.info(f"비동기 분류 서비스 시작 - {self.host}:{self.port}")
+        web.run_app(self.app, host=self.host, port=self.port, print=None)
+
+def main():
+    parser = argparse.ArgumentParser(description='비동기 URL 분류 서비스')
+    parser.add_argument('--host', default='0.0.0.0', help='서비스 호스트')
+    parser.add_argument('--port', type=int, default=5001, help='서비스 포트')
+    parser.add_argument('--model-path', default=MODEL_PATH, help='CatBoost 모델 경로')
+    parser.add_argument('--inference-threads', type=int, default=4, help='추론 스레드 수')
+    parser.add_argument('--queue-size', type=int, default=256, help='추론 대기 큐 크기 (가득 차면 503)')
+    parser.add_argument('--max-batch', type=int, default=256, help='추론 스레드가 한 번에 모아 처리할 최대 URL 수')
+    parser.add_argument('--retry-after', type=int, default=1, help='503 응답의 Retry-After 값 (초)')
+    parser.add_argument('--binary-address', default=os.environ.get('CLASSIFIER_BINARY_ADDRESS', 'localhost:5002'),
+                        help='바이너리 프로토콜 주소 (unix:/path/to.sock 또는 host:port, 빈 문자열: 사용 안 함)')
+    args = parser.parse_args()
+
+    service = ClassifierService(host=args.host, port=args.port, model_path=args.model_path,
+                                inference_threads=args.inference_threads, queue_size=args.queue_size,
+                                max_batch=args.max_batch, retry_after=args.retry_after,
+                                binary_address=args.binary_address)
+    service.run()
+
+if __name__ == '__main__':
+    main()
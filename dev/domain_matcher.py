@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger('domain_matcher')
+
+def normalize_hostname(value):
+    """URL, host:port, 호스트명 중 무엇이 주어져도 소문자 호스트명만 반환"""
+    host = value.strip()
+
+    # 스키마 제거
+    scheme_end = host.find('://')
+    if scheme_end != -1:
+        host = host[scheme_end + 3:]
+
+    # 경로, 쿼리, 프래그먼트 제거
+    for separator in ('/', '?', '#'):
+        index = host.find(separator)
+        if index != -1:
+            host = host[:index]
+
+    # 사용자 정보 제거
+    at = host.rfind('@')
+    if at != -1:
+        host = host[at + 1:]
+
+    # 포트 제거 (IPv6 주소는 대괄호 안의 값만 사용)
+    if host.startswith('['):
+        end = host.find(']')
+        host = host[1:end] if end != -1 else host[1:]
+    elif ':' in host:
+        host = host.split(':', 1)[0]
+
+    return host.rstrip('.').lower()
+
+def parse_domain_line(line):
+    """목록 파일의 한 줄에서 도메인 추출 (주석, 빈 줄은 None)
+
+    한 줄에 도메인 하나인 형식 외에 hosts 파일 형식(`0.0.0.0 domain`)과
+    Tranco 같은 CSV 형식(`rank,domain`)도 마지막 필드를 도메인으로 사용한다.
+    """
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return None
+    if ',' in line:
+        line = line.rsplit(',', 1)[1].strip()
+    else:
+        line = line.split()[-1]
+
+    # 와일드카드 표기 (*.example.com, .example.com) 는 접미사 매칭과 같으므로 제거
+    if line.startswith('*.'):
+        line = line[2:]
+    line = line.lstrip('.')
+
+    domain = normalize_hostname(line)
+    return domain or None
+
+def load_domain_file(path):
+    """도메인 목록 파일을 읽어 도메인 목록 반환"""
+    domains = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            domain = parse_domain_line(line)
+            if domain:
+                domains.append(domain)
+    return domains
+
+class DomainMatcher:
+    """도메인 자신과 모든 하위 도메인을 매칭하는 접미사 집합
+
+    조회 시 호스트명을 레이블 경계에서 잘라 가며 집합에 있는지 확인하므로
+    등록된 도메인 수와 관계없이 호스트명의 레이블 수만큼만 조회한다.
+    """
+
+    def __init__(self, domains=()):
+        self._suffixes = set()
+        self.update(domains)
+
+    @classmethod
+    def from_files(cls, paths, domains=()):
+        """기본 도메인 목록과 파일들의 도메인을 합쳐서 생성"""
+        matcher = cls(domains)
+        for path in paths:
+            loaded = load_domain_file(path)
+            matcher.update(loaded)
+            logger.info(f"도메인 목록 로드: {path} ({len(loaded)}개)")
+        return matcher
+
+    def add(self, domain):
+        domain = normalize_hostname(domain)
+        if domain:
+            self._suffixes.add(domain)
+
+    def update(self, domains):
+        for domain in domains:
+            self.add(domain)
+
+    def match_host(self, hostname):
+        """정규화된 호스트명이 등록된 도메인(또는 그 하위 도메인)이면 일치한 도메인 반환"""
+        suffixes = self._suffixes
+        if hostname in suffixes:
+            return hostname
+
+        dot = hostname.find('.')
+        while dot != -1:
+            suffix = hostname[dot + 1:]
+            if suffix in suffixes:
+                return suffix
+            dot = hostname.find('.', dot + 1)
+
+        return None
+
+    def matches(self, value):
+        """URL 또는 호스트명이 목록에 포함되는지 확인"""
+        hostname = normalize_hostname(value)
+        if not hostname:
+            return False
+        return self.match_host(hostname) is not None
+
+    def __contains__(self, value):
+        return self.matches(value)
+
+    def __len__(self):
+        return len(self._suffixes)
+
+class ReloadableDomainList:
+    """도메인 목록 파일을 감시하다가 바뀌면 매처를 새로 만들어 통째로 교체하는 클래스
+
+    파일 변경은 백그라운드 스레드에서 mtime / 크기 / inode 를 주기적으로 비교하여 감지하고,
+    새 매처는 같은 스레드에서 완성한 뒤 참조만 바꾸므로 조회하는 쪽은 잠금 없이
+    항상 완성된 매처 하나만 보게 된다.
+    """
+
+    def __init__(self, paths=(), domains=(), interval=5.0, name='domain list'):
+        self.paths = list(paths)
+        self.domains = list(domains)
+        self.interval = interval
+        self.name = name
+        self._signature = self._stat_files()
+        self.matcher = self._build()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _stat_files(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return signature
+
+    def _build(self):
+        paths = [path for path in self.paths if os.path.exists(path)]
+        for path in self.paths:
+            if path not in paths:
+                logger.warning(f"{self.name} 파일을 찾을 수 없음: {path}")
+        return DomainMatcher.from_files(paths, self.domains)
+
+    def reload_if_changed(self):
+        """파일이 바뀌었으면 다시 로드하고 True 반환"""
+        signature = self._stat_files()
+        if signature == self._signature:
+            return False
+
+        try:
+            matcher = self._build()
+        except Exception as e:
+            # 쓰는 도중인 파일 등으로 실패하면 기존 목록을 유지하고 다음 주기에 재시도
+            logger.error(f"{self.name} 다시 로드 실패: {e}")
+            return False
+
+        self.matcher = matcher
+        self._signature = signature
+        logger.info(f"{self.name} 다시 로드 완료: {len(matcher)}개")
+        return True
+
+    def _watch(self):
+        while not self._stop_event.wait(self.interval):
+            self.reload_if_changed()
+
+    def start(self):
+        """파일 감시 스레드 시작 (감시할 파일이 없으면 아무것도 하지 않음)"""
+        if not self.paths or self.interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name=f"{self.name} watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def matches(self, value):
+        return self.matcher.matches(value)
+
+    def __len__(self):
+        return len(self.matcher)
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger('eve_tailer')
+
+# 설치되어 있으면 더 빠른 JSON 파서 사용
+try:
+    import orjson
+    json_loads = orjson.loads
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    json_loads = json.loads
+    JSON_BACKEND = 'json'
+
+class EveTailer:
+    """Suricata EVE JSON 로그를 열어 둔 채로 이어서 읽는 클래스
+
+    큰 단위로 읽어 줄 단위로 나눈 뒤, 원하는 event_type 문자열이 들어 있는 줄만
+    JSON 으로 해석한다. inode 가 바뀌면(로그 회전) 이전 파일의 남은 부분을 마저 읽고
+    새 파일의 처음부터, 파일 크기가 읽은 위치보다 작아지면(잘림) 처음부터 다시 읽는다.
+    """
+
+    def __init__(self, path, event_types=('http',), chunk_size=1024 * 1024, start_at_end=True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.start_at_end = start_at_end
+
+        # Suricata 는 공백 없는 JSON 을 쓰지만 공백이 있는 형식도 허용
+        self.event_types = set(event_types)
+        self.patterns = []
+        for event_type in event_types:
+            self.patterns.append(f'"event_type":"{event_type}"'.encode('utf-8'))
+            self.patterns.append(f'"event_type": "{event_type}"'.encode('utf-8'))
+
+        self.file = None
+        self.inode = None
+        self.position = 0
+        self._partial = b''
+
+    def open(self, position=None):
+        """파일을 열고 position (없으면 start_at_end 에 따라 끝 또는 처음) 부터 읽을 준비"""
+        self.close()
+        try:
+            self.file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+
+        st = os.fstat(self.file.fileno())
+        self.inode = st.st_ino
+        if position is None:
+            position = st.st_size if self.start_at_end else 0
+        if position > st.st_size:
+            # 기록된 위치가 파일보다 뒤이면 다른 파일이므로 처음부터
+            position = 0
+        self.file.seek(position)
+        self.position = position
+        self._partial = b''
+        logger.info(f"EVE 로그 열기: {self.path} (inode: {self.inode}, 위치: {position})")
+        return True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _check_rotation(self):
+        """회전 / 잘림을 확인하여 (회전 여부, 잘림 여부) 반환"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 회전 직후 새 파일이 아직 없음
+            return False, False
+        if st.st_ino != self.inode:
+            return True, False
+        if st.st_size < self.position:
+            return False, True
+        return False, False
+
+    def read_events(self):
+        """새로 추가된 이벤트 중 대상 event_type 인 것만 해석하여 하나씩 반환 (제너레이터)"""
+        if self.file is None and not self.open():
+            return
+
+        rotated, truncated = self._check_rotation()
+        if truncated:
+            logger.info(f"EVE 로그가 잘림 - 처음부터 다시 읽음: {self.path}")
+            self.file.seek(0)
+            self.position = 0
+            self._partial = b''
+
+        for event in self._read_available():
+            yield event
+
+        if rotated:
+            # 이전 파일의 남은 부분까지 읽은 뒤 새 파일로 전환
+            logger.info(f"EVE 로그 회전 감지: {self.path}")
+            if self.open(position=0):
+                for event in self._read_available():
+                    yield event
+
+    def _read_available(self):
+        patterns = self.patterns
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+
+            data = self._partial + chunk if self._partial else chunk
+            lines = data.split(b'\n')
+            # 마지막 조각은 아직 쓰는 중인 줄이므로 다음 읽기로 넘김
+            self._partial = lines.pop()
+
+            for line in lines:
+                # 위치는 줄 단위로 갱신 (반환한 이벤트까지만 처리한 것으로 기록)
+                self.position += len(line) + 1
+
+                # JSON 해석 전에 바이트 문자열 검색으로 대상이 아닌 줄을 걸러냄
+                for pattern in patterns:
+                    if pattern in line:
+                        break
+                else:
+                    continue
+                try:
+                    event = json_loads(line)
+                except ValueError:
+                    continue
+                if event.get('event_type') in self.event_types:
+                    yield event
+
+    @property
+    def offset(self):
+        """완전히 처리한 마지막 줄 다음 위치"""
+        return self.position
@@ -0,0 +1,89 @@
+"""Flask URL 분류 서버용 gunicorn 설정
+
+사용 예:
+    gunicorn -c gunicorn.conf.py app:app
+
+모델은 마스터 프로세스에서 한 번 로드한 뒤 fork 하므로 작업자들이 모델 메모리를
+copy-on-write 로 공유한다. 작업자 수 / 스레드 수 / 타임아웃은 환경 변수로 조정한다.
+"""
+import multiprocessing
+import os
+
+# 바인드 주소
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# 작업자 프로세스 수 (기본: CPU 코어 수)
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+
+# 작업자당 스레드 수 (CatBoost 예측 중에는 GIL 이 해제되므로 I/O 대기와 겹칠 수 있음)
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# 요청 처리 제한 시간 (초)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# 메모리 누수 대비 작업자 주기적 교체 (0 이면 사용 안 함)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# fork 전에 app 모듈을 마스터에서 import
+preload_app = True
+
+# 작업자 준비 상태 표시 파일 디렉토리 (/ready 에서 확인)
+worker_ready_dir = os.environ.setdefault(
+    'WORKER_READY_DIR', os.path.join(os.environ.get('LOG_DIR', '/tmp'), 'gunicorn_ready')
+)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+
+# 작업자별 지표 파일 디렉토리 (/metrics 에서 모두 합쳐서 출력)
+metrics_dir = os.environ.setdefault(
+    'METRICS_DIR', os.path.join(os.environ.get('LOG_DIR', '/tmp'), 'gunicorn_metrics')
+)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def remove_stale_ready_markers(path):
+    """종료된 작업자의 준비 표시 파일만 삭제 (같은 디렉토리를 쓰는 다른 인스턴스의 작업자 파일은 유지)"""
+    for name in os.listdir(path):
+        try:
+            os.kill(int(name), 0)
+        except (ValueError, ProcessLookupError):
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+        except PermissionError:
+            pass
+
+def on_starting(server):
+    # 이전 실행에서 남은 준비 표시 파일 정리
+    os.makedirs(worker_ready_dir, exist_ok=True)
+    remove_stale_ready_markers(worker_ready_dir)
+    # 이전 실행의 지표 파일 정리 (살아 있는 작업자의 파일은 유지)
+    from metrics import remove_stale_snapshots
+    remove_stale_snapshots(metrics_dir)
+
+def when_ready(server):
+    # 작업자 fork 전에 마스터에서 모델 로드 (작업자들이 같은 메모리 페이지를 공유)
+    import app
+    app.load_model()
+    server.log.info(f"모델 사전 로드 완료 - 작업자 {workers}개, 작업자당 스레드 {threads}개")
+
+def post_worker_init(worker):
+    # 모델이 메모리에 있는지 확인한 뒤 준비 완료 표시
+    import app
+    app.load_model()
+    app.SHARED_METRICS.start()
+    app.mark_worker_ready()
+
+def worker_exit(server, worker):
+    import app
+    app.clear_worker_ready(worker.pid)
+    # 종료 직전 값을 기록해 두어 카운터 합계가 줄어들지 않게 함
+    app.SHARED_METRICS.stop()
+    # 작업자 프로세스에서 모아 둔 프로파일 저장
+    app.PROFILER.dump()
@@ -0,0 +1,365 @@
+"""Prometheus 텍스트 형식으로 내보내는 간단한 지표 모음 (proxy_server / app / classifier_service 공용)
+
+외부 라이브러리 없이 카운터 / 게이지 / 히스토그램만 제공한다. 값 갱신은 잠금 하나로
+보호하므로 이벤트 루프와 추론 스레드에서 함께 사용할 수 있다.
+
+사용 예:
+    registry = Registry()
+    requests_total = registry.counter('proxy_requests_total', '결과별 요청 수', ('outcome',))
+    requests_total.inc(outcome='blocked')
+    with registry.histogram('predict_seconds', '예측 시간').time():
+        ...
+    text = registry.render()
+
+gunicorn 작업자나 SO_REUSEPORT 작업자처럼 여러 프로세스가 같은 지표를 가지면
+SharedMetrics 로 작업자별 값을 공유 디렉토리에 기록하고 /metrics 요청 때 합쳐서 출력한다.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger('metrics')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 지연 시간 히스토그램 기본 구간 (초)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _render_family(name, help_text, kind, labelnames, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for suffix, key, extra, value in sorted(samples, key=lambda sample: sample[1]):
+        lines.append(f'{name}{suffix}{_format_labels(labelnames, key, extra)} {_format_value(value)}')
+    return '\n'.join(lines)
+
+class Metric:
+    kind = 'untyped'
+    # 여러 프로세스의 값을 합치는 방법 (SharedMetrics 에서 사용)
+    multiprocess_mode = 'sum'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        self._functions = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} 레이블이 맞지 않습니다: {sorted(labels)} (필요: {list(self.labelnames)})")
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as e:
+            raise ValueError(f"{self.name} 레이블이 없습니다: {e}")
+
+    def set_function(self, function, **labels):
+        """지표를 읽을 때마다 function() 을 호출하여 값을 얻음 (다른 객체의 통계를 노출할 때 사용)"""
+        self._functions[self._key(labels)] = function
+
+    def samples(self):
+        """(접미사, 레이블 값, 추가 레이블, 값) 목록"""
+        with self._lock:
+            items = list(self._values.items())
+        samples = [('', key, None, value) for key, value in items]
+        for key, function in list(self._functions.items()):
+            try:
+                samples.append(('', key, None, function()))
+            except Exception:
+                # 수집 중 오류가 난 값은 건너뜀 (다른 지표는 계속 노출)
+                continue
+        return samples
+
+    def render(self):
+        return _render_family(self.name, self.help_text, self.kind, self.labelnames, self.samples())
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    """게이지 (multiprocess_mode: 작업자별 값을 sum / max / min 으로 합치거나 all 이면 pid 레이블로 따로 출력)"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), multiprocess_mode='sum'):
+        super().__init__(name, help_text, labelnames)
+        if multiprocess_mode not in ('sum', 'max', 'min', 'all'):
+            raise ValueError(f"{name} 의 multiprocess_mode 가 올바르지 않습니다: {multiprocess_mode}")
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 구간별 개수 (마지막은 +Inf), 합계
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels):
+        """with 블록의 실행 시간을 기록하는 타이머"""
+        return _Timer(self, labels)
+
+    def summary(self, **labels):
+        """(관측 수, 합계) 반환"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return 0, 0.0
+            return sum(state[0]), state[1]
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1]) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('_bucket', key, ('le', _format_value(bound)), cumulative))
+            samples.append(('_sum', key, None, total))
+            samples.append(('_count', key, None, cumulative))
+        return samples
+
+class Registry:
+    """지표를 이름 순서대로 모아 두고 한 번에 출력하는 클래스"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"이미 등록된 지표: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), multiprocess_mode='sum'):
+        return self._register(Gauge(name, help_text, labelnames, multiprocess_mode))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        """Prometheus 텍스트 형식 문자열 반환"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+    def snapshot(self):
+        """지표별 정의와 현재 값 (SharedMetrics 가 JSON 으로 기록)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [{'name': metric.name, 'help': metric.help_text, 'kind': metric.kind,
+                 'labelnames': list(metric.labelnames), 'mode': metric.multiprocess_mode,
+                 'samples': metric.samples()} for metric in metrics]
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _snapshot_pid(filename):
+    try:
+        return int(filename.split('-', 1)[0])
+    except ValueError:
+        return None
+
+def remove_stale_snapshots(path):
+    """종료된 프로세스의 지표 파일 삭제 (서비스를 새로 시작할 때 이전 실행의 값을 지우는 용도)"""
+    if not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        pid = _snapshot_pid(name)
+        if pid is None or not _pid_alive(pid):
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+def render_snapshots(snapshots):
+    """여러 프로세스의 snapshot() 결과를 합쳐 Prometheus 텍스트 형식으로 반환
+
+    snapshots 는 (pid, 살아 있는지, snapshot) 목록. 카운터 / 히스토그램은 종료된 프로세스의
+    값도 더하고 (합계가 줄어들지 않도록), 게이지는 살아 있는 프로세스의 값만 합친다.
+    """
+    families = {}
+    for pid, alive, metrics in snapshots:
+        for metric in metrics:
+            mode = metric.get('mode', 'sum')
+            labelnames = tuple(metric['labelnames']) + (('pid',) if mode == 'all' else ())
+            family = families.setdefault(metric['name'], {
+                'help': metric['help'], 'kind': metric['kind'], 'labelnames': labelnames, 'values': {}})
+            if metric['kind'] == 'gauge' and not alive:
+                continue
+            values = family['values']
+            for suffix, key, extra, value in metric['samples']:
+                key = tuple(key) + ((str(pid),) if mode == 'all' else ())
+                sample = (suffix, key, tuple(extra) if extra else None)
+                if sample not in values:
+                    values[sample] = value
+                elif mode == 'max':
+                    values[sample] = max(values[sample], value)
+                elif mode == 'min':
+                    values[sample] = min(values[sample], value)
+                else:
+                    values[sample] += value
+    return '\n'.join(
+        _render_family(name, family['help'], family['kind'], family['labelnames'],
+                       [sample + (value,) for sample, value in family['values'].items()])
+        for name, family in families.items()) + '\n'
+
+class SharedMetrics:
+    """작업자 프로세스별 지표를 공유 디렉토리에 기록하고 출력할 때 모두 합치는 클래스
+
+    각 작업자는 interval 마다 자기 지표를 <path>/<pid>-<임의 값>.json 에 쓰고, render() 는
+    자기 값을 새로 쓴 뒤 디렉토리의 모든 파일을 합친다. 따라서 다른 작업자의 값은 최대
+    interval 만큼 늦을 수 있다. path 가 없거나 start() 전이면 현재 프로세스의 값만 출력한다.
+    """
+
+    def __init__(self, registry, path, interval=1.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.pid = None
+        self.file_path = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """현재 프로세스의 지표 기록 시작 (fork 한 뒤 작업자 프로세스 안에서 호출)"""
+        if not self.path or self._thread is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        self.pid = os.getpid()
+        # 종료된 작업자와 pid 가 같아도 그 작업자의 값을 덮어쓰지 않도록 임의 값을 붙임
+        self.file_path = os.path.join(self.path, f"{self.pid}-{os.urandom(4).hex()}.json")
+        self.write()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """기록 스레드를 멈추고 마지막 값을 기록 (카운터는 종료 후에도 합계에 포함)"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+        self.write()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        if self.file_path is None:
+            return
+        try:
+            temp_path = f"{self.file_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(temp_path, self.file_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"지표 파일 쓰기 중 오류: {e}")
+
+    def render(self):
+        """모든 작업자의 지표를 합쳐 Prometheus 텍스트 형식으로 반환"""
+        if self.file_path is None:
+            return self.registry.render()
+        self.write()
+        snapshots = []
+        for name in sorted(os.listdir(self.path)):
+            pid = _snapshot_pid(name)
+            if pid is None or not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    metrics = json.load(f)
+            except (OSError, ValueError):
+                # 읽는 사이에 삭제되었거나 손상된 파일은 건너뜀
+                continue
+            snapshots.append((pid, pid == self.pid or _pid_alive(pid), metrics))
+        return render_snapshots(snapshots)
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('monitor_state')
+
+class OffsetCheckpoint:
+    """EVE 로그를 어디까지 처리했는지 (inode, 바이트 위치) 를 파일에 기록하는 클래스"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """기록된 (inode, 위치) 반환 (없거나 읽을 수 없으면 None)"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return int(data['inode']), int(data['offset'])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"체크포인트 파일을 읽을 수 없음: {self.path} ({e})")
+            return None
+
+    def save(self, inode, offset):
+        """임시 파일에 쓴 뒤 이름을 바꿔 중간에 끊겨도 이전 기록이 남도록 저장"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'inode': inode, 'offset': offset, 'saved_at': time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+class OffsetTracker:
+    """읽은 위치가 아니라 처리가 끝난 위치까지만 체크포인트에 기록하기 위한 클래스
+
+    읽기 단계는 이벤트마다 (inode, 그 줄 다음 위치) 를 읽은 순서대로 기록하고, 이벤트를 끝까지
+    처리한 단계(필터에서 걸러짐 / 차단 / 분류 후 판정 저장)가 완료 표시를 한다. 저장할 위치는
+    앞에서부터 연속으로 완료된 마지막 이벤트의 위치이므로, 큐에 남아 있거나 분류 중인 이벤트가
+    있으면 그 앞에서 멈춘다. 강제 종료되어도 처리하지 못한 이벤트부터 다시 읽는다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 처리 중인 이벤트 [inode, 위치, 완료 여부] (읽은 순서)
+        self._entries = deque()
+        self._read = None
+        self._committed = None
+
+    def advance(self, inode, offset):
+        """대상 이벤트 없이 읽은 위치만 갱신 (걸러진 줄 / 처음 연 위치)"""
+        with self._lock:
+            self._read = (inode, offset)
+
+    def add(self, inode, offset):
+        """읽은 이벤트를 기록하고 done() 에 넘길 토큰 반환"""
+        entry = [inode, offset, False]
+        with self._lock:
+            if not self._entries:
+                # 처리 중인 이벤트가 없으면 지금까지 읽은 위치는 모두 처리된 것
+                self._committed = self._read
+            self._entries.append(entry)
+            self._read = (inode, offset)
+        return entry
+
+    def done(self, entry):
+        """이벤트 처리 완료 표시 (같은 토큰을 여러 번 넘겨도 됨)"""
+        with self._lock:
+            entry[2] = True
+            entries = self._entries
+            while entries and entries[0][2]:
+                first = entries.popleft()
+                self._committed = (first[0], first[1])
+
+    def committed(self):
+        """다시 시작할 때 이어서 읽을 (inode, 위치) 반환 (아직 없으면 None)"""
+        with self._lock:
+            if not self._entries:
+                return self._read
+            return self._committed
+
+    def pending(self):
+        """읽었지만 처리가 끝나지 않은 이벤트 수"""
+        with self._lock:
+            return len(self._entries)
+
+class VerdictStore:
+    """이미 판정한 URL 을 만료 시간과 함께 보관하는 SQLite 저장소
+
+    재시작 후에도 같은 URL 을 다시 분류하지 않도록 판정 결과를 남겨 두며,
+    여러 분류 작업자 스레드가 연결 하나를 잠금으로 나누어 쓴다.
+    """
+
+    def __init__(self, path, benign_ttl=300.0, malicious_ttl=7 * 24 * 3600.0):
+        self.path = path
+        self.benign_ttl = benign_ttl
+        self.malicious_ttl = malicious_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS verdicts ('
+            'url TEXT PRIMARY KEY, is_malicious INTEGER NOT NULL, '
+            'probability REAL NOT NULL, expires REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS verdicts_expires ON verdicts (expires)')
+        self._conn.commit()
+
+    def put_many(self, verdicts):
+        """[(URL, 악성 여부, 확률), ...] 를 한 번의 트랜잭션으로 저장"""
+        now = time.time()
+        rows = [(url, 1 if is_malicious else 0, float(probability),
+                 now + (self.malicious_ttl if is_malicious else self.benign_ttl))
+                for url, is_malicious, probability in verdicts]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+    def load_recent(self, benign_limit, malicious_limit):
+        """만료되지 않은 판정을 정상 / 악성 각각 최근 것부터 반환 [(URL, 악성 여부, 남은 시간), ...]
+
+        악성 판정은 TTL 이 훨씬 길어 만료 시각 하나로 정렬하면 정상 판정이 밀려나므로 따로 가져온다.
+        같은 종류 안에서는 TTL 이 같으므로 만료 시각이 늦을수록 최근에 판정한 것이다.
+        """
+        now = time.time()
+        query = ('SELECT url, is_malicious, expires FROM verdicts WHERE is_malicious = ? AND expires > ? '
+                 'ORDER BY expires DESC LIMIT ?')
+        with self._lock:
+            rows = self._conn.execute(query, (0, now, benign_limit)).fetchall()
+            rows += self._conn.execute(query, (1, now, malicious_limit)).fetchall()
+        return [(url, bool(is_malicious), expires - now) for url, is_malicious, expires in rows]
+
+    def purge_expired(self):
+        with self._lock:
+            deleted = self._conn.execute('DELETE FROM verdicts WHERE expires <= ?', (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,225 @@
+"""요청 단계별 시간 측정과 표본 프로파일링 (proxy_server / app 공용)
+
+StageTimer 는 요청 하나의 단계별 소요 시간을 모아 Server-Timing 헤더와 로그용 딕셔너리로
+만든다. SampledProfiler 는 켜져 있을 때 일부 요청에서만 cProfile (또는 설치되어 있으면 yappi) 을
+실행하고, 모은 결과를 LOG_DIR 에 .prof (pstats) 와 .txt (상위 함수 요약) 로 저장한다.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger('profiling')
+
+PROFILER_BACKENDS = ('cprofile', 'yappi')
+
+class StageTimer:
+    """요청 하나의 단계별 소요 시간 기록"""
+
+    __slots__ = ('started', 'last', 'stages')
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        # 단계 이름 -> 초 (같은 이름이면 합산, 기록 순서 유지)
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def lap(self, name):
+        """직전 lap (또는 시작) 이후 지난 시간을 name 단계로 기록"""
+        now = time.perf_counter()
+        self.add(name, now - self.last)
+        self.last = now
+
+    def stage(self, name, histogram=None):
+        """with 블록의 실행 시간을 name 단계로 기록 (histogram 이 있으면 함께 기록)"""
+        return _Stage(self, name, histogram)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing 헤더 값 (밀리초)"""
+        parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.stages.items()]
+        parts.append(f'total;dur={self.total() * 1000:.2f}')
+        return ', '.join(parts)
+
+    def as_dict(self):
+        """로그용 {단계: 밀리초} (total 포함)"""
+        timings = {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+        timings['total'] = round(self.total() * 1000, 3)
+        return timings
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'histogram', 'started')
+
+    def __init__(self, timer, name, histogram):
+        self.timer = timer
+        self.name = name
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        self.timer.add(self.name, seconds)
+        if self.histogram is not None:
+            self.histogram.observe(seconds)
+
+class SampledProfiler:
+    """표본으로 뽑힌 요청 동안만 프로파일러를 켜고 결과를 모아 파일로 저장하는 클래스
+
+    프로파일러는 한 번에 하나만 실행하므로 다른 요청을 프로파일링하는 중이면 표본에서 제외한다.
+    이벤트 루프에서 사용하면 해당 요청이 끝날 때까지 같은 스레드에서 실행된 다른 요청의 코드도
+    함께 기록되므로, 결과는 요청 하나가 아니라 그 시간 동안의 이벤트 루프 전체 모습이다.
+    """
+
+    def __init__(self, name, directory, sample_rate=0.0, backend='cprofile', dump_every=100):
+        self.name = name
+        self.directory = directory
+        self.dump_every = dump_every
+        self.sample_rate = 0.0
+        self.backend = 'cprofile'
+
+        self.samples = 0
+        self.dumps = 0
+        self.last_dump = None
+        self._lock = threading.Lock()
+        self._active = False
+        self._stats = None
+        self._pending = 0
+        self._yappi = None
+
+        self.configure(sample_rate=sample_rate, backend=backend)
+
+    def configure(self, sample_rate=None, backend=None):
+        """표본 비율 / 방식 변경 (끄거나 방식을 바꾸면 모아 둔 결과를 먼저 저장)"""
+        if backend is not None and backend not in PROFILER_BACKENDS:
+            raise ValueError(f"알 수 없는 프로파일러: {backend}")
+        if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate 는 0 과 1 사이여야 합니다.")
+        if backend == 'yappi' and self._yappi is None:
+            try:
+                import yappi
+            except ImportError:
+                raise ValueError("yappi 가 설치되어 있지 않습니다.")
+            # 코루틴이 기다리는 시간도 포함하도록 실제 경과 시간 기준으로 측정
+            yappi.set_clock_type('wall')
+            self._yappi = yappi
+
+        turning_off = sample_rate == 0.0 and self.sample_rate > 0.0
+        switching = backend is not None and backend != self.backend
+        if (turning_off or switching) and self._pending:
+            self.dump()
+
+        if backend is not None:
+            self.backend = backend
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        logger.info(f"프로파일링 설정 - 비율: {self.sample_rate}, 방식: {self.backend}")
+        return self.status()
+
+    def start(self):
+        """이 요청을 프로파일링하면 토큰, 아니면 None 반환"""
+        if self.sample_rate <= 0.0 or random.random() >= self.sample_rate:
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+
+        if self.backend == 'yappi':
+            self._yappi.start()
+            return 'yappi'
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 다른 프로파일러 (디버거 등) 가 이미 실행 중
+            with self._lock:
+                self._active = False
+            return None
+        return profile
+
+    def finish(self, token):
+        """프로파일링 종료 (저장할 때가 되었으면 True 반환, 저장은 호출한 쪽에서 dump())"""
+        if token is None:
+            return False
+        if token == 'yappi':
+            # yappi 는 멈춘 뒤에도 결과를 계속 누적하므로 dump() 때 가져옴
+            self._yappi.stop()
+        else:
+            token.disable()
+
+        with self._lock:
+            if token != 'yappi':
+                if self._stats is None:
+                    self._stats = pstats.Stats(token)
+                else:
+                    self._stats.add(token)
+            self.samples += 1
+            self._pending += 1
+            self._active = False
+            return self._pending >= self.dump_every
+
+    def dump(self):
+        """모아 둔 결과를 LOG_DIR 에 저장하고 .prof 경로 반환 (없으면 None)"""
+        with self._lock:
+            stats, self._stats = self._stats, None
+            pending, self._pending = self._pending, 0
+            if pending and self.backend == 'yappi' and self._yappi is not None:
+                # 다른 요청이 yappi 를 다시 시작하기 전에 결과를 가져와 비움
+                yappi_stats = self._yappi.get_func_stats()
+                self._yappi.clear_stats()
+            else:
+                yappi_stats = None
+            if pending:
+                self.dumps += 1
+            sequence = self.dumps
+        if not pending:
+            return None
+
+        # 같은 초에 여러 번 저장하거나 여러 작업자 프로세스가 저장해도 겹치지 않도록 PID / 순번 포함
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"profile_{self.name}_{os.getpid()}_"
+                                            f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{sequence}")
+        path = base + '.prof'
+        try:
+            if yappi_stats is not None:
+                yappi_stats.save(path, type='pstat')
+            elif stats is not None:
+                stats.dump_stats(path)
+            else:
+                return None
+
+            # 사람이 바로 볼 수 있는 누적 시간 기준 상위 함수 요약
+            summary = io.StringIO()
+            pstats.Stats(path, stream=summary).sort_stats('cumulative').print_stats(40)
+            with open(base + '.txt', 'w') as f:
+                f.write(f"# {self.name} - 표본 요청 {pending}건\n")
+                f.write(summary.getvalue())
+        except Exception as e:
+            logger.error(f"프로파일 저장 중 오류: {e}")
+            return None
+
+        self.last_dump = path
+        logger.info(f"프로파일 저장: {path} (표본 요청 {pending}건)")
+        return path
+
+    def status(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'backend': self.backend,
+            'samples': self.samples,
+            'pending': self._pending,
+            'last_dump': self.last_dump
+        }
@@ -2,32 +2,84 @@
 import asyncio
 import aiohttp
 from aiohttp import web
+from multidict import CIMultiDict
 import json
 import requests
 import logging
+import logging.handlers
+import queue
+import random
 import ssl
 import re
 from urllib.parse import urlparse
 from datetime import datetime
 import os
 import argparse
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+
+from audit_log import AuditLogWriter
+from classifier_protocol import AsyncClassifierClient
+from domain_matcher import ReloadableDomainList
+from metrics import CONTENT_TYPE, Registry, SharedMetrics, remove_stale_snapshots
+from profiling import SampledProfiler, StageTimer
+from worker_supervisor import WorkerSupervisor
 
 # 로그 디렉토리 설정
 LOG_DIR = os.environ.get('LOG_DIR', os.path.expanduser('~/url_classifier/logs'))
 
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(LOG_DIR, 'proxy_server.log'))
-    ]
-)
 logger = logging.getLogger('proxy_server')
 
+def setup_logging(level=logging.INFO, background=True, with_pid=False):
+    """로그 기록을 큐에 넣고 별도 스레드에서 파일에 쓰도록 설정 (이벤트 루프에서 디스크 I/O 없음)
+    
+    background=False 이면 파일에 바로 쓰고 None 반환 (다중 작업자 관리자 프로세스용,
+    fork 전에 로그 스레드를 만들지 않음). 이미 설정된 루트 핸들러는 교체한다.
+    """
+    file_handler = logging.FileHandler(os.path.join(LOG_DIR, 'proxy_server.log'))
+    # 여러 작업자가 같은 파일에 쓰면 프로세스를 구분할 수 있도록 PID 포함
+    name_format = '%(name)s[%(process)d]' if with_pid else '%(name)s'
+    file_handler.setFormatter(logging.Formatter(f'%(asctime)s - {name_format} - %(levelname)s - %(message)s'))
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    
+    if not background:
+        root.addHandler(file_handler)
+        return None
+    
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    return listener
+
+def audit_log_path(worker_index=None):
+    """차단 로그 경로 (다중 작업자이면 작업자별 파일, 각자 회전하므로 한 파일을 나누어 쓰지 않음)"""
+    if worker_index is None:
+        return os.path.join(LOG_DIR, 'blocked_urls.log')
+    return os.path.join(LOG_DIR, f'blocked_urls.worker{worker_index}.log')
+
 # Flask 서버 URL(환경 변수로부터 가져옴)
 FLASK_SERVER_URL = os.environ.get('FLASK_SERVER_URL', 'http://localhost:5000/predict')
 
+# Flask 일괄 분류 URL (기본값: FLASK_SERVER_URL 과 같은 서버의 /predict_batch)
+FLASK_BATCH_URL = os.environ.get('FLASK_BATCH_URL', FLASK_SERVER_URL.rsplit('/', 1)[0] + '/predict_batch')
+
+# 바이너리 프로토콜 분류 서비스 주소 (unix:/path/to.sock 또는 host:port)
+CLASSIFIER_ADDRESS = os.environ.get('CLASSIFIER_ADDRESS', 'localhost:5002')
+
+# 분류 응답에서 사용하는 항목 (URL 과 특성은 받지 않음)
+PREDICT_FIELDS = 'is_malicious,probability'
+
+# 임베디드 분류 모드에서 사용할 모델 경로
+MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(os.getcwd(), 'model', 'catboost_url_model.cbm'))
+
 # 화이트리스트 도메인 (차단하지 않을 도메인)
 WHITELIST_DOMAINS = [
     # 시스템 연결성 확인
@@ -171,48 +223,711 @@ BLOCKED_PAGE_HTML = """<!DOCTYPE html>
 </body>
 </html>"""
 
+class URLCheckCoalescer:
+    """짧은 구간 동안 모인 URL 검사 요청을 하나의 일괄 분류 호출로 묶는 클래스"""
+    
+    def __init__(self, classify_batch, window=0.002, max_batch=64):
+        # classify_batch: URL 목록을 받아 같은 순서의 (악성 여부, 확률) 목록을 반환하는 코루틴 함수
+        # (분류에 실패하면 None 반환)
+        self.classify_batch = classify_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self._flush_handle = None
+        self._tasks = set()
+    
+    async def check(self, url):
+        """URL 검사를 대기열에 넣고 해당 URL의 판정 결과를 기다림 (분류 실패 시 None)"""
+        loop = asyncio.get_running_loop()
+        
+        # 같은 구간에 들어온 동일 URL은 하나의 future 를 공유
+        future = self._pending.get(url)
+        if future is None:
+            future = loop.create_future()
+            self._pending[url] = future
+            
+            if len(self._pending) >= self.max_batch:
+                self.flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self.flush)
+        
+        # 한 요청이 취소되어도 같은 URL을 기다리는 다른 요청에는 영향이 없도록 보호
+        return await asyncio.shield(future)
+    
+    def flush(self):
+        """대기 중인 URL을 하나의 배치로 분류 요청"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch(self, batch):
+        urls = list(batch)
+        try:
+            verdicts = await self.classify_batch(urls)
+            if verdicts is None:
+                verdicts = [None] * len(urls)
+            elif len(verdicts) != len(urls):
+                raise ValueError(f"배치 응답 개수 불일치: 요청 {len(urls)}건, 응답 {len(verdicts)}건")
+        except Exception as e:
+            logger.error(f"일괄 URL 검사 중 오류: {e}", exc_info=True)
+            verdicts = [None] * len(urls)
+        
+        for url, verdict in zip(urls, verdicts):
+            future = batch[url]
+            if not future.done():
+                future.set_result(verdict)
+
+class VerdictCache:
+    """정규화된 URL 별 분류 결과를 보관하는 TTL + LRU 캐시"""
+    
+    def __init__(self, max_entries=10000, benign_ttl=300.0, malicious_ttl=3600.0):
+        self.max_entries = max_entries
+        self.benign_ttl = benign_ttl
+        self.malicious_ttl = malicious_ttl
+        # key -> (악성 여부, 확률, 만료 시각)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """캐시된 (악성 여부, 확률) 반환, 없거나 만료되었으면 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        is_malicious, probability, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return is_malicious, probability
+    
+    def put(self, key, is_malicious, probability):
+        ttl = self.malicious_ttl if is_malicious else self.benign_ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        
+        self._entries[key] = (is_malicious, probability, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        
+        # 가장 오래 사용되지 않은 항목부터 제거
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+class TunnelEndpoint(asyncio.Protocol):
+    """CONNECT 터널의 한쪽 소켓 (클라이언트 또는 업스트림)
+    
+    받은 데이터를 반대편 transport 에 바로 쓰고, 반대편 쓰기 버퍼가 가득 차면
+    이쪽 읽기를 멈추는 방식으로 배압을 전달한다.
+    """
+    
+    def __init__(self, tunnel):
+        self.tunnel = tunnel
+        self.transport = None
+        self.peer = None
+        self.eof = False
+        # 데이터를 받기 전에 반대편이 아직 연결되지 않았을 때만 사용하는 버퍼
+        self._pending = []
+    
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=self.tunnel.buffer_size)
+    
+    def data_received(self, data):
+        self.tunnel.touch()
+        if self.peer is None or self.peer.transport is None:
+            self._pending.append(data)
+            return
+        self.peer.transport.write(data)
+    
+    def eof_received(self):
+        # 반쪽 종료: 반대편에 FIN 을 전달하고 반대 방향은 계속 유지
+        self.eof = True
+        if self.peer is not None and self.peer.transport is not None:
+            if self.peer.transport.can_write_eof():
+                self.peer.transport.write_eof()
+        if self.peer is None or self.peer.eof:
+            self.tunnel.close()
+            return False
+        return True
+    
+    def pause_writing(self):
+        # 이쪽 쓰기 버퍼가 가득 차면 반대편 읽기를 멈춤
+        if self.peer is not None and self.peer.transport is not None:
+            self.peer.transport.pause_reading()
+    
+    def resume_writing(self):
+        if self.peer is not None and self.peer.transport is not None:
+            self.peer.transport.resume_reading()
+    
+    def connection_lost(self, exc):
+        self.tunnel.close()
+    
+    def flush_pending(self):
+        """반대편 연결 전에 받은 데이터를 전달"""
+        pending, self._pending = self._pending, []
+        for data in pending:
+            self.peer.transport.write(data)
+
+
+class ClientTunnelEndpoint(TunnelEndpoint):
+    """aiohttp 로부터 넘겨받은 클라이언트 쪽 소켓"""
+    
+    def __init__(self, tunnel, handler_protocol):
+        super().__init__(tunnel)
+        self.handler_protocol = handler_protocol
+    
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        # aiohttp 요청 핸들러가 연결 종료를 알고 정리할 수 있도록 전달
+        self.handler_protocol.connection_lost(exc)
+
+
+class ConnectTunnel:
+    """CONNECT 요청 이후 클라이언트와 업스트림 사이에서 바이트를 양방향으로 중계하는 클래스"""
+    
+    def __init__(self, buffer_size=256 * 1024, idle_timeout=120.0):
+        self.buffer_size = buffer_size
+        self.idle_timeout = idle_timeout
+        self.client = None
+        self.upstream = None
+        self.done = None
+        self._loop = None
+        self._last_activity = 0.0
+        self._idle_handle = None
+    
+    def touch(self):
+        self._last_activity = self._loop.time()
+    
+    async def run(self, request, host, port, connect_timeout=10.0):
+        """업스트림 연결 후 클라이언트 transport 를 넘겨받아 터널이 닫힐 때까지 중계"""
+        self._loop = asyncio.get_running_loop()
+        self.done = self._loop.create_future()
+        self.touch()
+        
+        # 업스트림 연결 (실패 시 예외를 그대로 올려 502 응답)
+        self.upstream = TunnelEndpoint(self)
+        await asyncio.wait_for(
+            self._loop.create_connection(lambda: self.upstream, host, port),
+            timeout=connect_timeout
+        )
+        
+        # 연결 직후 업스트림이 바로 닫았으면 (FIN / RST) 클라이언트를 넘겨받지 않고 502 응답
+        if self.done.done():
+            raise ConnectionError(f"업스트림이 터널 시작 전에 연결을 닫았습니다: {host}:{port}")
+        
+        # 클라이언트 transport 를 aiohttp 에서 넘겨받음
+        transport = request.transport
+        handler_protocol = request.protocol
+        self.client = ClientTunnelEndpoint(self, handler_protocol)
+        self.client.peer = self.upstream
+        self.upstream.peer = self.client
+        
+        version = request.version
+        transport.write(f"HTTP/{version.major}.{version.minor} 200 Connection Established\r\n\r\n".encode())
+        transport.set_protocol(self.client)
+        self.client.connection_made(transport)
+        
+        # 200 응답 전에 클라이언트가 미리 보낸 데이터가 aiohttp 에 남아 있으면 먼저 전달
+        # (파이썬 파서는 request.content 에, C 파서는 프로토콜의 _message_tail 에 보관)
+        buffered = request.content.read_nowait()
+        if buffered:
+            self.upstream.transport.write(buffered)
+        message_tail = getattr(handler_protocol, '_message_tail', b'')
+        if message_tail:
+            handler_protocol._message_tail = b''
+            self.upstream.transport.write(message_tail)
+        self.upstream.flush_pending()
+        
+        if not transport.is_reading():
+            transport.resume_reading()
+        
+        self._idle_handle = self._loop.call_later(self.idle_timeout, self._check_idle)
+        await self.done
+    
+    def _check_idle(self):
+        idle = self._loop.time() - self._last_activity
+        if idle >= self.idle_timeout:
+            logger.info(f"유휴 시간 초과로 터널 종료 ({idle:.0f}초)")
+            self.close()
+        else:
+            self._idle_handle = self._loop.call_later(self.idle_timeout - idle, self._check_idle)
+    
+    def close(self):
+        """양쪽 연결을 닫고 터널 종료"""
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        for endpoint in (self.client, self.upstream):
+            if endpoint is not None and endpoint.transport is not None:
+                endpoint.transport.close()
+        if self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+class EmbeddedClassifier:
+    """Flask 서버를 거치지 않고 프록시 프로세스 안에서 CatBoost 모델로 URL 을 분류하는 클래스"""
+    
+    def __init__(self, model_path, feature_seconds=None, predict_seconds=None):
+        # 원격 분류 모드에서는 CatBoost / NumPy 가 필요 없으므로 사용할 때만 가져옴
+        from catboost import CatBoostClassifier
+        import url_features
+        
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"모델 파일을 찾을 수 없습니다: {model_path}")
+        self.model = CatBoostClassifier()
+        self.model.load_model(model_path)
+        self.build_feature_matrix = url_features.build_feature_matrix
+        self.threshold = url_features.THRESHOLD
+        
+        # 특성 추출 / 예측 시간 히스토그램 (스레드 실행기에서만 프록시 지표에 기록)
+        self.feature_seconds = feature_seconds
+        self.predict_seconds = predict_seconds
+        logger.info(f"임베디드 분류 모델 로드 성공: {model_path}")
+    
+    def classify(self, urls):
+        """URL 목록을 한 번에 분류하여 같은 순서의 (악성 여부, 확률) 목록 반환"""
+        if self.feature_seconds is None:
+            probabilities = self.model.predict_proba(self.build_feature_matrix(urls))[:, 1]
+            return [(bool(p > self.threshold), float(p)) for p in probabilities]
+        
+        with self.feature_seconds.time():
+            matrix = self.build_feature_matrix(urls)
+        with self.predict_seconds.time():
+            probabilities = self.model.predict_proba(matrix)[:, 1]
+        return [(bool(p > self.threshold), float(p)) for p in probabilities]
+
+# 프로세스 풀 작업자마다 한 번 로드되는 분류기
+_worker_classifier = None
+
+def _init_classifier_worker(model_path):
+    global _worker_classifier
+    _worker_classifier = EmbeddedClassifier(model_path)
+
+def _classify_in_worker(urls):
+    return _worker_classifier.classify(urls)
+
 class URLProxyServer:
-    def __init__(self, host='0.0.0.0', port=8888):
+    def __init__(self, host='0.0.0.0', port=8888, batch_window=0.002, batch_max_size=64,
+                 pool_size=100, pool_size_per_host=10, classifier_pool_size=20,
+                 keepalive_timeout=30.0, dns_cache_ttl=300, stream_chunk_size=64 * 1024,
+                 tunnel_buffer_size=256 * 1024, tunnel_idle_timeout=120.0, tunnel_connect_timeout=10.0,
+                 upstream_connect_timeout=10.0, upstream_read_timeout=300.0,
+                 cache_size=10000, cache_benign_ttl=300.0, cache_malicious_ttl=3600.0,
+                 whitelist_files=(), blacklist_files=(), list_reload_interval=5.0,
+                 classifier='remote', model_path=MODEL_PATH, classifier_workers=2, classifier_executor='thread',
+                 classifier_address=CLASSIFIER_ADDRESS, audit_flush_interval=1.0,
+                 audit_max_bytes=100 * 1024 * 1024, audit_compress=False,
+                 log_sample_rate=0.01, log_headers=False, server_timing=True, slow_request_ms=1000.0,
+                 profile_sample_rate=0.0, profile_backend='cprofile', profile_dump_every=100,
+                 metrics_dir=None, worker_index=None):
         self.host = host
         self.port = port
-        self.app = web.Application()
+        
+        # --workers 로 실행한 경우 작업자 번호 (캐시 / 연결 풀 / 목록은 모두 작업자별로 따로 보유)
+        self.worker_index = worker_index
+        
+        # 분류 방식: remote (Flask 서버) / embedded (프록시 프로세스 안에서 직접 추론)
+        #           binary (분류 서비스와 바이너리 프로토콜)
+        self.classifier = classifier
+        self.model_path = model_path
+        self.classifier_workers = classifier_workers
+        self.classifier_executor = classifier_executor
+        self.embedded_classifier = None
+        self.executor = None
+        self.binary_client = None
+        
+        if classifier == 'embedded':
+            classify_batch = self.classify_batch_embedded
+        elif classifier == 'binary':
+            # 연결은 첫 요청 때 이벤트 루프 안에서 맺음
+            self.binary_client = AsyncClassifierClient(classifier_address, timeout=5.0)
+            classify_batch = self.binary_client.classify
+        else:
+            classify_batch = self.classify_batch
+        self.coalescer = URLCheckCoalescer(classify_batch, window=batch_window, max_batch=batch_max_size)
+        self.verdict_cache = VerdictCache(max_entries=cache_size, benign_ttl=cache_benign_ttl,
+                                          malicious_ttl=cache_malicious_ttl)
+        
+        # 화이트리스트 (기본 목록 + 외부 파일) 및 차단 목록 (외부 파일), 파일이 바뀌면 자동으로 다시 로드
+        self.whitelist = ReloadableDomainList(whitelist_files, WHITELIST_DOMAINS,
+                                              interval=list_reload_interval, name='화이트리스트')
+        self.blacklist = ReloadableDomainList(blacklist_files,
+                                              interval=list_reload_interval, name='차단 목록')
+        
+        # 연결 풀 설정
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.classifier_pool_size = classifier_pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        
+        # 본문 중계 시 한 번에 읽고 쓰는 최대 크기
+        self.stream_chunk_size = stream_chunk_size
+        
+        # CONNECT 터널 설정
+        self.tunnel_buffer_size = tunnel_buffer_size
+        self.tunnel_idle_timeout = tunnel_idle_timeout
+        self.tunnel_connect_timeout = tunnel_connect_timeout
+        
+        # 업스트림 HTTP 요청 제한 시간 (전체 시간 제한은 두지 않아 큰 다운로드 / 긴 스트리밍도 중계)
+        self.upstream_connect_timeout = upstream_connect_timeout
+        self.upstream_read_timeout = upstream_read_timeout
+        
+        # 요청별 상세 로그 기록 비율 (DEBUG 레벨이면 모든 요청) / 요청 헤더 기록 여부
+        self.log_sample_rate = log_sample_rate
+        self.log_headers = log_headers
+        
+        # 단계별 시간: Server-Timing 응답 헤더 여부 / 이 시간(ms) 이상 걸린 요청은 항상 기록 (0: 기록 안 함)
+        self.server_timing = server_timing
+        self.slow_request_threshold = slow_request_ms / 1000.0 if slow_request_ms > 0 else None
+        
+        # 표본 프로파일링 (/admin/profiling 으로 실행 중에 켜고 끌 수 있음)
+        self.profiler = SampledProfiler('proxy', LOG_DIR, sample_rate=profile_sample_rate,
+                                        backend=profile_backend, dump_every=profile_dump_every)
+        
+        # 차단 기록은 백그라운드 스레드가 모아서 기록 (이벤트 루프에서 파일 I/O 없음)
+        self.audit_log = AuditLogWriter(audit_log_path(worker_index),
+                                        flush_interval=audit_flush_interval,
+                                        max_bytes=audit_max_bytes, compress=audit_compress)
+        
+        # on_startup 에서 생성되는 공유 세션
+        self.upstream_session = None
+        self.classifier_session = None
+        
+        self.setup_metrics()
+        # --workers 로 실행하면 작업자별 지표를 metrics_dir 에 기록하고 /metrics 에서 합쳐서 출력
+        self.shared_metrics = SharedMetrics(self.metrics, metrics_dir)
+        
+        self.app = web.Application(middlewares=[self.metrics_middleware, self.connect_middleware])
+        self.app.on_startup.append(self.start_sessions)
+        self.app.on_startup.append(self.start_list_watchers)
+        self.app.on_startup.append(self.start_embedded_classifier)
+        self.app.on_startup.append(self.start_audit_log)
+        self.app.on_startup.append(self.start_shared_metrics)
+        self.app.on_cleanup.append(self.close_sessions)
+        self.app.on_cleanup.append(self.stop_embedded_classifier)
+        self.app.on_cleanup.append(self.stop_audit_log)
+        self.app.on_cleanup.append(self.stop_list_watchers)
+        self.app.on_cleanup.append(self.stop_profiler)
+        self.app.on_cleanup.append(self.stop_shared_metrics)
         self.setup_routes()
         
     def setup_routes(self):
-        # 라우트 설정
+        # 라우트 설정 (/metrics, /admin 은 모든 경로를 받는 라우트보다 먼저 등록)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+        self.app.router.add_route('*', '/admin/profiling', self.handle_admin_profiling)
         self.app.router.add_route('*', '/{path:.*}', self.handle_request)
+    
+    def setup_metrics(self):
+        """/metrics 로 노출할 지표 생성"""
+        self.metrics = Registry()
+        self.metric_requests = self.metrics.counter(
+            'proxy_requests_total', '처리 결과별 요청 수 (whitelisted, allowed, blocked, error)', ('outcome',))
+        self.metric_in_flight = self.metrics.gauge(
+            'proxy_in_flight_requests', '처리 중인 요청 수 (열려 있는 CONNECT 터널 포함)')
+        self.metric_check_url = self.metrics.histogram(
+            'proxy_check_url_seconds', 'URL 검사 시간 (캐시 조회 포함)')
+        self.metric_forward = self.metrics.histogram(
+            'proxy_forward_request_seconds', '업스트림 요청 전달부터 응답 본문 중계 완료까지 걸린 시간')
+        self.metric_feature_seconds = self.metrics.histogram(
+            'classifier_feature_extraction_seconds', '임베디드 분류의 배치별 특성 추출 시간 (스레드 실행기만)')
+        self.metric_predict_seconds = self.metrics.histogram(
+            'classifier_predict_proba_seconds', '임베디드 분류의 배치별 predict_proba 시간 (스레드 실행기만)')
+        
+        cache = self.verdict_cache
+        self.metrics.counter('proxy_verdict_cache_hits_total', '분류 결과 캐시 적중 수').set_function(lambda: cache.hits)
+        self.metrics.counter('proxy_verdict_cache_misses_total', '분류 결과 캐시 부재 수').set_function(lambda: cache.misses)
+        self.metrics.gauge('proxy_verdict_cache_entries', '분류 결과 캐시 항목 수').set_function(lambda: len(cache))
+        # 작업자별 적중률은 더해도 의미가 없으므로 pid 레이블로 따로 출력
+        self.metrics.gauge('proxy_verdict_cache_hit_ratio', '분류 결과 캐시 적중률',
+                           multiprocess_mode='all').set_function(
+            lambda: cache.stats()['hit_ratio'])
+        
+        pool_in_use = self.metrics.gauge('proxy_connection_pool_in_use', '사용 중인 연결 수', ('pool',))
+        pool_idle = self.metrics.gauge('proxy_connection_pool_idle', '재사용을 기다리는 유휴 연결 수', ('pool',))
+        pool_limit = self.metrics.gauge('proxy_connection_pool_limit', '최대 연결 수 (0: 무제한)', ('pool',))
+        for pool, attribute in (('upstream', 'upstream_session'), ('classifier', 'classifier_session')):
+            pool_in_use.set_function(lambda attribute=attribute: self.pool_usage(attribute)[0], pool=pool)
+            pool_idle.set_function(lambda attribute=attribute: self.pool_usage(attribute)[1], pool=pool)
+            pool_limit.set_function(lambda attribute=attribute: self.pool_usage(attribute)[2], pool=pool)
+    
+    def pool_usage(self, attribute):
+        """세션의 (사용 중, 유휴, 최대) 연결 수"""
+        session = getattr(self, attribute)
+        if session is None:
+            return 0, 0, 0
+        connector = session.connector
+        # aiohttp 가 공개 API 로 제공하지 않아 커넥터 내부 상태를 읽음
+        in_use = len(getattr(connector, '_acquired', ()))
+        idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        return in_use, idle, connector.limit
+    
+    @web.middleware
+    async def metrics_middleware(self, request, handler):
+        """처리 중 요청 수와 결과별 요청 수 집계 (결과는 각 처리 단계에서 request['outcome'] 에 기록)"""
+        self.metric_in_flight.inc()
+        try:
+            return await handler(request)
+        finally:
+            self.metric_in_flight.dec()
+            outcome = request.get('outcome')
+            if outcome is not None:
+                self.metric_requests.inc(outcome=outcome)
+    
+    @staticmethod
+    def is_proxy_request(request):
+        """프록시 요청 (GET http://example.com/metrics) 이면 True
+        
+        raw_path 는 요청 줄의 대상 그대로이므로 프록시 요청이면 'http://...' 로 시작한다.
+        이런 요청은 경로가 /metrics 등과 같아도 그대로 중계해야 한다.
+        """
+        return not request.raw_path.startswith('/')
+    
+    async def handle_metrics(self, request):
+        """Prometheus 형식 지표 반환 (--workers 로 실행하면 모든 작업자의 값을 합침)"""
+        if self.is_proxy_request(request):
+            return await self.handle_request(request)
+        return web.Response(body=self.shared_metrics.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+    
+    async def start_shared_metrics(self, app):
+        self.shared_metrics.start()
+    
+    async def stop_shared_metrics(self, app):
+        await asyncio.get_running_loop().run_in_executor(None, self.shared_metrics.stop)
+    
+    async def handle_admin_profiling(self, request):
+        """프로파일링 상태 조회 (GET) / 설정 변경 (POST {"sample_rate": 0.05, "backend": "cprofile", "dump": true})
+        
+        프록시 서버에 직접 접속한 로컬 요청만 허용
+        """
+        if self.is_proxy_request(request):
+            return await self.handle_request(request)
+        if request.remote not in ('127.0.0.1', '::1'):
+            return web.json_response({'error': '로컬에서만 사용할 수 있습니다.'}, status=403)
+        if request.method == 'GET':
+            return web.json_response(self.profiler.status())
+        if request.method != 'POST':
+            return web.json_response({'error': '허용되지 않는 메서드입니다.'}, status=405)
+        
+        try:
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise ValueError("JSON 객체가 필요합니다.")
+            sample_rate = data.get('sample_rate')
+            status = self.profiler.configure(
+                sample_rate=float(sample_rate) if sample_rate is not None else None,
+                backend=data.get('backend')
+            )
+        except (ValueError, TypeError) as e:
+            return web.json_response({'error': str(e)}, status=400)
+        
+        if data.get('dump'):
+            path = await asyncio.get_running_loop().run_in_executor(None, self.profiler.dump)
+            status = self.profiler.status()
+            status['dumped'] = path
+        return web.json_response(status)
+    
+    async def stop_profiler(self, app):
+        # 종료 전에 모아 둔 프로파일 저장
+        await asyncio.get_running_loop().run_in_executor(None, self.profiler.dump)
+    
+    def finish_request(self, request):
+        """단계별 시간 기록 및 프로파일링 종료"""
+        timer = request['timer']
+        total = timer.total()
+        # CONNECT 는 터널이 열려 있는 시간 전체가 포함되므로 느린 요청으로 보지 않음
+        slow = (self.slow_request_threshold is not None and total >= self.slow_request_threshold
+                and request.method != 'CONNECT')
+        if slow or request.get('log_detail', False):
+            timings = timer.as_dict()
+            message = f"요청 단계별 시간 (ms) - {request.method} {request.host}{request.path}: {json.dumps(timings)}"
+            if slow:
+                logger.warning(f"느린 {message}", extra={'timings': timings})
+            else:
+                logger.info(message, extra={'timings': timings})
+        
+        self.finish_profile(request)
+    
+    def finish_profile(self, request):
+        """표본 프로파일링 종료 (이미 종료했으면 아무것도 하지 않음)"""
+        profile, request['profile'] = request.get('profile'), None
+        if self.profiler.finish(profile):
+            # 파일 쓰기는 이벤트 루프 밖에서
+            asyncio.get_running_loop().run_in_executor(None, self.profiler.dump)
+    
+    @web.middleware
+    async def connect_middleware(self, request, handler):
+        """CONNECT 요청은 경로가 없어 라우트와 매칭되지 않으므로 직접 처리"""
+        if request.method == 'CONNECT':
+            return await self.handle_request(request)
+        return await handler(request)
+    
+    async def start_sessions(self, app):
+        """업스트림 전달용 / 분류 요청용 공유 세션 생성"""
+        # SSL 컨텍스트는 한 번만 생성하여 재사용 (HTTPS 용)
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        
+        upstream_connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=self.pool_size,
+            limit_per_host=self.pool_size_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        # 여러 클라이언트가 세션을 공유하므로 쿠키는 저장하지 않고,
+        # 응답 본문은 압축된 그대로 중계
+        # 기본값(전체 300초)이면 느린 대용량 응답이 중간에 끊기므로 연결 / 읽기 유휴 시간만 제한
+        self.upstream_session = aiohttp.ClientSession(
+            connector=upstream_connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False,
+            timeout=aiohttp.ClientTimeout(total=None,
+                                          sock_connect=self.upstream_connect_timeout or None,
+                                          sock_read=self.upstream_read_timeout or None)
+        )
+        
+        classifier_connector = aiohttp.TCPConnector(
+            limit=self.classifier_pool_size,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self.classifier_session = aiohttp.ClientSession(
+            connector=classifier_connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=5)
+        )
+        
+        logger.info(f"연결 풀 생성 - 전체: {self.pool_size}, 호스트당: {self.pool_size_per_host}, "
+                    f"분류 서버: {self.classifier_pool_size}")
+    
+    async def start_audit_log(self, app):
+        self.audit_log.start()
+    
+    async def stop_audit_log(self, app):
+        # 남은 기록을 쓰는 동안 이벤트 루프를 막지 않도록 실행기에서 대기
+        await asyncio.get_running_loop().run_in_executor(None, self.audit_log.close)
+    
+    async def start_list_watchers(self, app):
+        """화이트리스트 / 차단 목록 파일 감시 시작"""
+        self.whitelist.start()
+        self.blacklist.start()
+    
+    async def stop_list_watchers(self, app):
+        self.whitelist.stop()
+        self.blacklist.stop()
+    
+    async def start_embedded_classifier(self, app):
+        """임베디드 분류 모드일 때 모델과 추론 실행기 준비"""
+        if self.classifier != 'embedded':
+            return
+        
+        if self.classifier_executor == 'process':
+            # 작업자 프로세스마다 모델을 한 번씩 로드 (특성 추출까지 GIL 없이 병렬 처리)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.classifier_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_classifier_worker,
+                initargs=(self.model_path,)
+            )
+        else:
+            # 모델은 한 번만 로드하고 스레드끼리 공유 (CatBoost 예측 중에는 GIL 해제)
+            self.embedded_classifier = EmbeddedClassifier(self.model_path,
+                                                          feature_seconds=self.metric_feature_seconds,
+                                                          predict_seconds=self.metric_predict_seconds)
+            self.executor = ThreadPoolExecutor(max_workers=self.classifier_workers,
+                                               thread_name_prefix='classifier')
+        
+        logger.info(f"임베디드 분류 모드 - 실행기: {self.classifier_executor}, 작업자: {self.classifier_workers}")
+    
+    async def stop_embedded_classifier(self, app):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+    
+    async def close_sessions(self, app):
+        """공유 세션 종료"""
+        for session in (self.upstream_session, self.classifier_session):
+            if session is not None:
+                await session.close()
+        self.upstream_session = None
+        self.classifier_session = None
+        if self.binary_client is not None:
+            await self.binary_client.close()
 
     # URL이 화이트리스트에 있는지 확인하는 함수
     def is_whitelisted(self, url):
-        
         try:
-            parsed = urlparse(url)
-            hostname = parsed.netloc.lower()
-            
-            # 호스트명에서 포트 제거
-            if ':' in hostname:
-                hostname = hostname.split(':')[0]
-            
-            for whitelist_domain in WHITELIST_DOMAINS:
-                if hostname == whitelist_domain or hostname.endswith('.' + whitelist_domain):
-                    logger.info(f"화이트리스트 도메인: {hostname}")
-                    return True
-            
-            return False
+            return self.whitelist.matches(url)
         except Exception as e:
             logger.error(f"화이트리스트 확인 중 오류: {e}")
             return False
     
+    # URL이 차단 목록에 있는지 확인하는 함수
+    def is_blacklisted(self, url):
+        try:
+            return self.blacklist.matches(url)
+        except Exception as e:
+            logger.error(f"차단 목록 확인 중 오류: {e}")
+            return False
+    
     # 모든 HTTP 요청 처리 비동기 함수
+    def sample_request(self):
+        """이 요청의 상세 로그를 남길지 결정"""
+        if logger.isEnabledFor(logging.DEBUG):
+            return True
+        return self.log_sample_rate > 0 and random.random() < self.log_sample_rate
+    
+    def log_request_detail(self, request):
+        logger.info(f"요청 메서드: {request.method}")
+        if self.log_headers:
+            # 헤더는 구조화된 필드로도 전달 (JSON 포매터 등에서 사용)
+            headers = dict(request.headers)
+            logger.info(f"요청 헤더: {json.dumps(headers, ensure_ascii=False)}", extra={'headers': headers})
+    
     async def handle_request(self, request):
+        # 처리 결과 (지표용, 중간에 예외가 나면 error 로 남음) / 단계별 시간 / 표본 프로파일링
+        request['outcome'] = 'error'
+        timer = request['timer'] = StageTimer()
+        request['profile'] = self.profiler.start()
         try:
-            # 디버그 로그
-            logger.info(f"요청 메서드: {request.method}")
-            logger.info(f"요청 헤더: {dict(request.headers)}")
+            # 상세 로그는 표본으로 뽑힌 요청만 기록
+            detail = request['log_detail'] = self.sample_request()
+            if detail:
+                self.log_request_detail(request)
             
             # CONNECT 메서드 처리 (HTTPS 프록시)
             if request.method == 'CONNECT':
-                logger.info("CONNECT 메서드 감지 - HTTPS 터널링")
                 return await self.handle_connect(request)
             
             # 요청 URL 구성
@@ -228,74 +943,115 @@ class URLProxyServer:
                 logger.error(f"잘못된 요청: {request}")
                 return web.Response(text="Invalid request", status=400)
             
-            logger.info(f"요청 URL: {url}")
+            if detail:
+                logger.info(f"요청 URL: {url}")
+            
+            # 차단 목록 확인 (분류 없이 바로 차단)
+            if self.is_blacklisted(url):
+                logger.warning(f"차단 목록 URL 차단됨: {url}")
+                request['outcome'] = 'blocked'
+                return self.blocked_response(request, url, 1.0)
+            timer.lap('blacklist')
             
             # 화이트리스트 확인
             if self.is_whitelisted(url):
-                logger.info(f"화이트리스트 URL 통과: {url}")
+                if detail:
+                    logger.info(f"화이트리스트 URL 통과: {url}")
+                request['outcome'] = 'whitelisted'
+                timer.lap('whitelist')
                 return await self.forward_request(request)
+            timer.lap('whitelist')
             
             # URL 검사
             is_malicious, probability = await self.check_url(url)
-            logger.info(f"URL 검사 결과 - 악성: {is_malicious}, 확률: {probability:.4f}")
+            timer.lap('classify')
+            if detail:
+                logger.info(f"URL 검사 결과 - 악성: {is_malicious}, 확률: {probability:.4f}")
             
             if is_malicious:
                 # 악성 URL인 경우 차단 페이지 반환
                 logger.warning(f"악성 URL 차단됨: {url} - 확률: {probability:.4f}")
-
-                blocked_log_file = os.path.join(LOG_DIR, 'blocked_urls.log')
-                blocked_entry = {
-                    'timestamp': datetime.now().isoformat(),
-                    'url': url,
-                    'probability': probability,
-                    'source_ip': request.remote,
-                    'user_agent': request.headers.get('User-Agent', '')
-                }
-    
-                with open(blocked_log_file, 'a') as f:
-                    f.write(json.dumps(blocked_entry) + '\n')
-                
-                # HTML 생성 시 timestamp 추가
-                blocked_html = BLOCKED_PAGE_HTML.format(
-                    url=url, 
-                    probability=probability,
-                    timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                )
-                
-                # 응답 헤더 설정
-                headers = {
-                    'Content-Type': 'text/html; charset=utf-8',
-                    'Cache-Control': 'no-cache, no-store, must-revalidate',
-                    'Pragma': 'no-cache',
-                    'Expires': '0'
-                }
-                
-                return web.Response(
-                    text=blocked_html,
-                    status=403,
-                    headers=headers
-                )
+                request['outcome'] = 'blocked'
+                return self.blocked_response(request, url, probability)
             
             # 정상 URL인 경우 실제 요청 전달
-            logger.info(f"정상 URL 전달: {url}")
+            if detail:
+                logger.info(f"정상 URL 전달: {url}")
+            request['outcome'] = 'allowed'
             return await self.forward_request(request)
             
         except Exception as e:
+            request['outcome'] = 'error'
             logger.error(f"요청 처리 중 오류: {e}", exc_info=True)
             return web.Response(text=f"Error: {str(e)}", status=500)
+        finally:
+            self.finish_request(request)
+    
+    def add_server_timing(self, request, headers):
+        """단계별 시간을 Server-Timing 헤더에 추가 (업스트림이 보낸 값은 그대로 두고 한 줄 더 붙임)"""
+        timer = request.get('timer')
+        if not self.server_timing or timer is None:
+            return
+        headers.add('Server-Timing', timer.server_timing())
+    
+    def blocked_response(self, request, url, probability):
+        """차단 로그를 남기고 차단 페이지 응답 생성"""
+        blocked_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'url': url,
+            'probability': probability,
+            'source_ip': request.remote,
+            'user_agent': request.headers.get('User-Agent', '')
+        }
+        
+        self.audit_log.write(blocked_entry)
+        
+        # HTML 생성 시 timestamp 추가
+        blocked_html = BLOCKED_PAGE_HTML.format(
+            url=url, 
+            probability=probability,
+            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        
+        # 응답 헤더 설정
+        headers = CIMultiDict({
+            'Content-Type': 'text/html; charset=utf-8',
+            'Cache-Control': 'no-cache, no-store, must-revalidate',
+            'Pragma': 'no-cache',
+            'Expires': '0'
+        })
+        self.add_server_timing(request, headers)
+        
+        return web.Response(
+            text=blocked_html,
+            status=403,
+            headers=headers
+        )
     
     async def handle_connect(self, request):
         """HTTPS CONNECT 메서드 처리"""
         try:
-            # CONNECT 요청에서 대상 호스트 추출
-            host, port = request.path_qs.split(':')
-            port = int(port)
+            # CONNECT 요청에서 대상 호스트 추출 (authority-form: host:port)
+            host = request.url.raw_host
+            port = request.url.port or 443
+            
+            detail = request.get('log_detail', False)
+            if detail:
+                logger.info(f"CONNECT 터널 요청: {host}:{port}")
+            timer = request['timer']
             
-            logger.info(f"CONNECT 터널 요청: {host}:{port}")
+            # 차단 목록 확인 (분류 없이 바로 차단)
+            if self.is_blacklisted(host):
+                logger.warning(f"차단 목록 HTTPS 사이트 차단: {host}")
+                request['outcome'] = 'blocked'
+                return web.Response(text="Forbidden", status=403)
+            timer.lap('blacklist')
             
             # 화이트리스트 확인
             if self.is_whitelisted(f"https://{host}"):
-                logger.info(f"화이트리스트 HTTPS 사이트: {host}")
+                if detail:
+                    logger.info(f"화이트리스트 HTTPS 사이트: {host}")
+                request['outcome'] = 'whitelisted'
             else:
                 # URL 검사 (HTTPS URL로 구성)
                 https_url = f"https://{host}/"
@@ -303,17 +1059,35 @@ class URLProxyServer:
                 
                 if is_malicious:
                     logger.warning(f"악성 HTTPS 사이트 차단: {host}")
+                    request['outcome'] = 'blocked'
                     return web.Response(text="Forbidden", status=403)
+                request['outcome'] = 'allowed'
+            timer.lap('classify')
+            # 프로파일링은 검사 단계까지만 (터널이 열려 있는 동안 프로파일러를 계속 켜 두지 않음)
+            self.finish_profile(request)
             
-            # 터널링을 위한 응답
+            # 업스트림과 연결 후 터널링 시작
+            tunnel = ConnectTunnel(buffer_size=self.tunnel_buffer_size,
+                                   idle_timeout=self.tunnel_idle_timeout)
+            await tunnel.run(request, host, port, connect_timeout=self.tunnel_connect_timeout)
+            timer.lap('tunnel')
+            if detail:
+                logger.info(f"CONNECT 터널 종료: {host}:{port}")
+            
+            # 연결은 이미 터널에서 닫혔으므로 이 응답은 실제로 전송되지 않음
             return web.Response(status=200, reason='Connection Established')
             
         except Exception as e:
+            request['outcome'] = 'error'
             logger.error(f"CONNECT 처리 중 오류: {e}")
             return web.Response(text="Bad Gateway", status=502)
     
     # URL을 검사하여 악성 여부 확인하는 비동기 함수
     async def check_url(self, url):
+        with self.metric_check_url.time():
+            return await self._check_url(url)
+    
+    async def _check_url(self, url):
         try:
             # 원본 URL 저장
             original_url = url
@@ -329,38 +1103,69 @@ class URLProxyServer:
             if normalized_url.endswith('/'):
                 normalized_url = normalized_url[:-1]
             
-            logger.info(f"Flask 서버로 URL 검사 요청: {normalized_url}")
+            # 최근 분류 결과가 캐시에 있으면 바로 반환
+            cached = self.verdict_cache.get(normalized_url)
+            if cached is not None:
+                return cached
             
-            # Flask 서버에 정규화된 URL로 분류 요청
-            async with aiohttp.ClientSession() as session:
-                async with session.post(FLASK_SERVER_URL, 
-                                    json={'url': normalized_url}, 
-                                    timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Flask 서버 응답: {result}")
-                        return result.get('is_malicious', False), result.get('probability', 0.0)
-                    else:
-                        logger.error(f"Flask 서버 오류: {response.status}")
-                        logger.error(f"응답 내용: {await response.text()}")
+            logger.debug(f"URL 검사 요청: {normalized_url}")
             
-            return False, 0.0
+            # 동시에 들어온 다른 요청과 묶어서 Flask 서버에 분류 요청
+            verdict = await self.coalescer.check(normalized_url)
+            if verdict is None:
+                # 분류 실패 시 안전을 위해 통과 (캐시하지 않음)
+                return False, 0.0
+            
+            self.verdict_cache.put(normalized_url, *verdict)
+            return verdict
             
-        except aiohttp.ClientConnectorError:
-            logger.error(f"Flask 서버에 연결할 수 없습니다: {FLASK_SERVER_URL}")
-            return False, 0.0
         except Exception as e:
             logger.error(f"URL 검사 중 오류: {e}", exc_info=True)
             # 오류 발생 시 안전을 위해 통과
             return False, 0.0
     
+    # 여러 URL을 Flask 서버에 한 번에 분류 요청하는 비동기 함수
+    async def classify_batch(self, urls):
+        try:
+            async with self.classifier_session.post(FLASK_BATCH_URL, params={'fields': PREDICT_FIELDS},
+                                                    json={'urls': urls}) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.debug(f"Flask 서버 일괄 응답: {len(urls)}건")
+                    return [(item.get('is_malicious', False), item.get('probability', 0.0))
+                            for item in result.get('results', [])]
+                else:
+                    logger.error(f"Flask 서버 오류: {response.status}")
+                    logger.error(f"응답 내용: {await response.text()}")
+            
+            return None
+            
+        except aiohttp.ClientConnectorError:
+            logger.error(f"Flask 서버에 연결할 수 없습니다: {FLASK_BATCH_URL}")
+            return None
+    
+    # 여러 URL을 프록시 프로세스 안에서 한 번에 분류하는 비동기 함수
+    async def classify_batch_embedded(self, urls):
+        loop = asyncio.get_running_loop()
+        # 추론은 이벤트 루프를 막지 않도록 실행기에서 수행
+        if self.embedded_classifier is not None:
+            return await loop.run_in_executor(self.executor, self.embedded_classifier.classify, urls)
+        return await loop.run_in_executor(self.executor, _classify_in_worker, urls)
+    
     # 웹사이트로 요청을 전달하는 비동기 함수
     async def forward_request(self, request):
+        with self.metric_forward.time():
+            return await self._forward_request(request)
+    
+    async def _forward_request(self, request):
+        stream_response = None
+        timer = request.get('timer')
         try:
-            # 원본 요청 헤더 복사
-            headers = dict(request.headers)
-            headers.pop('Host', None)
-            headers.pop('Proxy-Connection', None)
+            # 원본 요청 헤더 복사 (홉 단위 헤더 제외, 같은 이름의 헤더가 여러 개면 모두 유지)
+            headers = CIMultiDict(request.headers)
+            headers.popall('Host', None)
+            headers.popall('Proxy-Connection', None)
+            headers.popall('Transfer-Encoding', None)
             
             # 원본 URL 구성
             if 'Host' in request.headers:
@@ -374,55 +1179,205 @@ class URLProxyServer:
                 # 요청 URL 직접 사용
                 url = str(request.url)
                 
-            logger.info(f"요청 전달: {url}")
+            if request.get('log_detail', False):
+                logger.info(f"요청 전달: {url}")
             
-            # SSL 컨텍스트 생성 (HTTPS 용)
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
+            # 요청 본문은 전체를 읽지 않고 청크 단위로 업스트림에 전달
+            body = request.content.iter_chunked(self.stream_chunk_size) if request.body_exists else None
             
-            # 요청 전달
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.request(
-                    method=request.method,
-                    url=url,
-                    headers=headers,
-                    data=await request.read(),
-                    allow_redirects=False
-                ) as response:
-                    # 응답 본문 읽기
-                    body = await response.read()
-                    
-                    # 응답 헤더 복사
-                    response_headers = dict(response.headers)
-                    response_headers.pop('Content-Encoding', None)
-                    response_headers.pop('Transfer-Encoding', None)
-                    response_headers.pop('Connection', None)
-                    
-                    return web.Response(
-                        body=body,
-                        status=response.status,
-                        headers=response_headers
-                    )
+            # 공유 세션으로 요청 전달 (연결 재사용)
+            async with self.upstream_session.request(
+                method=request.method,
+                url=url,
+                headers=headers,
+                data=body,
+                allow_redirects=False
+            ) as response:
+                # 업스트림 연결 + 응답 헤더 수신까지
+                if timer is not None:
+                    timer.lap('upstream')
+                
+                # 응답 헤더 복사 (본문은 압축 해제 없이 그대로 전달)
+                # dict 로 바꾸면 여러 줄의 Set-Cookie 가 마지막 하나만 남으므로 CIMultiDict 로 복사
+                response_headers = CIMultiDict(response.headers)
+                response_headers.popall('Transfer-Encoding', None)
+                response_headers.popall('Connection', None)
+                response_headers.popall('Keep-Alive', None)
+                # 본문 전송 시간은 헤더를 보낸 뒤에 정해지므로 Server-Timing 에는 들어가지 않고 로그에만 기록
+                self.add_server_timing(request, response_headers)
+                
+                stream_response = web.StreamResponse(
+                    status=response.status,
+                    reason=response.reason,
+                    headers=response_headers
+                )
+                await stream_response.prepare(request)
+                
+                # 업스트림 응답을 받는 대로 클라이언트에 전달 (write 가 drain 하므로 배압 적용)
+                async for chunk in response.content.iter_chunked(self.stream_chunk_size):
+                    await stream_response.write(chunk)
+                
+                await stream_response.write_eof()
+                if timer is not None:
+                    timer.lap('transfer')
+                return stream_response
                     
         except Exception as e:
+            request['outcome'] = 'error'
             logger.error(f"요청 전달 중 오류: {e}")
+            if stream_response is not None and stream_response.prepared:
+                # 이미 응답 헤더를 보낸 경우 연결을 끊어 클라이언트가 불완전한 응답을 알 수 있게 함
+                stream_response.force_close()
+                return stream_response
             return web.Response(text=f"Proxy Error: {str(e)}", status=502)
     
-    def run(self):
-        """프록시 서버 실행"""
-        logger.info(f"URL 프록시 서버 시작 - {self.host}:{self.port}")
-        web.run_app(self.app, host=self.host, port=self.port)
+    def run(self, reuse_port=False, shutdown_timeout=60.0):
+        """프록시 서버 실행
+        
+        reuse_port 이면 SO_REUSEPORT 로 다른 작업자 프로세스와 같은 포트를 공유한다.
+        SIGTERM 을 받으면 새 연결을 받지 않고 처리 중인 요청을 shutdown_timeout 초까지 기다린다.
+        """
+        if self.worker_index is None:
+            logger.info(f"URL 프록시 서버 시작 - {self.host}:{self.port}")
+            web.run_app(self.app, host=self.host, port=self.port, reuse_port=reuse_port,
+                        shutdown_timeout=shutdown_timeout)
+        else:
+            logger.info(f"URL 프록시 작업자 {self.worker_index} 시작 - {self.host}:{self.port}")
+            web.run_app(self.app, host=self.host, port=self.port, reuse_port=reuse_port,
+                        shutdown_timeout=shutdown_timeout, print=None)
 
 def main():
     parser = argparse.ArgumentParser(description='URL 프록시 서버')
     parser.add_argument('--host', default='0.0.0.0', help='호스트 주소')
     parser.add_argument('--port', type=int, default=8888, help='포트 번호')
+    parser.add_argument('--batch-window-ms', type=float, default=2.0, help='URL 검사 요청을 묶는 최대 대기 시간 (ms)')
+    parser.add_argument('--batch-max-size', type=int, default=64, help='한 번에 묶어서 분류할 최대 URL 수')
+    parser.add_argument('--pool-size', type=int, default=100, help='업스트림 전체 최대 연결 수 (0: 무제한)')
+    parser.add_argument('--pool-size-per-host', type=int, default=10, help='업스트림 호스트당 최대 연결 수 (0: 무제한)')
+    parser.add_argument('--classifier-pool-size', type=int, default=20, help='분류 서버 최대 연결 수')
+    parser.add_argument('--keepalive-timeout', type=float, default=30.0, help='유휴 연결 유지 시간 (초)')
+    parser.add_argument('--dns-cache-ttl', type=int, default=300, help='DNS 캐시 유지 시간 (초)')
+    parser.add_argument('--stream-chunk-size', type=int, default=64 * 1024, help='본문 중계 청크 크기 (바이트)')
+    parser.add_argument('--tunnel-buffer-size', type=int, default=256 * 1024, help='CONNECT 터널 방향별 쓰기 버퍼 상한 (바이트)')
+    parser.add_argument('--tunnel-idle-timeout', type=float, default=120.0, help='CONNECT 터널 유휴 종료 시간 (초)')
+    parser.add_argument('--tunnel-connect-timeout', type=float, default=10.0, help='CONNECT 업스트림 연결 제한 시간 (초)')
+    parser.add_argument('--upstream-connect-timeout', type=float, default=10.0,
+                        help='업스트림 HTTP 연결 제한 시간 (초, 0: 제한 없음)')
+    parser.add_argument('--upstream-read-timeout', type=float, default=300.0,
+                        help='업스트림 응답을 읽을 때 데이터 없이 기다리는 최대 시간 (초, 0: 제한 없음)')
+    parser.add_argument('--cache-size', type=int, default=10000, help='분류 결과 캐시 최대 항목 수 (0: 사용 안 함)')
+    parser.add_argument('--cache-ttl-benign', type=float, default=300.0, help='정상 판정 캐시 유지 시간 (초)')
+    parser.add_argument('--cache-ttl-malicious', type=float, default=3600.0, help='악성 판정 캐시 유지 시간 (초)')
+    parser.add_argument('--whitelist-file', action='append', default=[], help='추가 화이트리스트 도메인 파일 (여러 번 지정 가능)')
+    parser.add_argument('--blacklist-file', action='append', default=[], help='차단 목록 도메인 파일 (여러 번 지정 가능, 분류 없이 차단)')
+    parser.add_argument('--list-reload-interval', type=float, default=5.0, help='목록 파일 변경 확인 주기 (초, 0: 감시 안 함)')
+    parser.add_argument('--classifier', choices=['remote', 'embedded', 'binary'], default='remote',
+                        help='URL 분류 방식 (remote: Flask 서버 호출, embedded: 프록시 안에서 직접 추론, '
+                             'binary: 분류 서비스와 바이너리 프로토콜)')
+    parser.add_argument('--classifier-address', default=CLASSIFIER_ADDRESS,
+                        help='바이너리 프로토콜 분류 서비스 주소 (unix:/path/to.sock 또는 host:port)')
+    parser.add_argument('--model-path', default=MODEL_PATH, help='임베디드 분류 모드의 CatBoost 모델 경로')
+    parser.add_argument('--classifier-workers', type=int, default=2, help='임베디드 분류 작업자 수')
+    parser.add_argument('--classifier-executor', choices=['thread', 'process'], default='thread',
+                        help='임베디드 분류 실행기 종류')
+    parser.add_argument('--audit-flush-interval', type=float, default=1.0, help='차단 로그 파일 쓰기 주기 (초)')
+    parser.add_argument('--audit-max-bytes', type=int, default=100 * 1024 * 1024,
+                        help='차단 로그 회전 크기 (바이트, 0 이면 날짜로만 회전)')
+    parser.add_argument('--audit-compress', action='store_true', help='회전된 차단 로그를 gzip 으로 압축')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='로그 레벨 (DEBUG 이면 모든 요청의 상세 로그 기록)')
+    parser.add_argument('--log-sample-rate', type=float, default=0.01,
+                        help='요청별 상세 로그를 남길 요청 비율 (0~1, 차단 / 오류 로그는 항상 기록)')
+    parser.add_argument('--log-headers', action='store_true', help='상세 로그에 요청 헤더 포함')
+    parser.add_argument('--server-timing', action=argparse.BooleanOptionalAction, default=True,
+                        help='응답에 단계별 처리 시간 Server-Timing 헤더 추가')
+    parser.add_argument('--slow-request-ms', type=float, default=1000.0,
+                        help='이 시간(ms) 이상 걸린 요청은 단계별 시간을 항상 로그에 기록 (0: 기록 안 함)')
+    parser.add_argument('--profile-sample-rate', type=float, default=0.0,
+                        help='프로파일링할 요청 비율 (0~1, 0: 사용 안 함, 실행 중에는 /admin/profiling 으로 변경)')
+    parser.add_argument('--profile-backend', choices=['cprofile', 'yappi'], default='cprofile',
+                        help='프로파일러 종류 (yappi 는 별도 설치 필요)')
+    parser.add_argument('--profile-dump-every', type=int, default=100,
+                        help='프로파일링한 요청이 이만큼 모이면 LOG_DIR 에 결과 저장')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='이벤트 루프 작업자 프로세스 수 (2 이상이면 SO_REUSEPORT 로 같은 포트를 공유, '
+                             '캐시 / 차단 로그는 작업자별)')
+    parser.add_argument('--metrics-dir', default=None,
+                        help='작업자별 지표 파일 디렉토리 (--workers 2 이상에서 /metrics 가 모든 작업자의 값을 합침, '
+                             '기본: LOG_DIR/proxy_metrics_<포트>)')
+    parser.add_argument('--drain-timeout', type=float, default=60.0,
+                        help='종료 시 처리 중인 요청을 기다리는 최대 시간 (초)')
     args = parser.parse_args()
-
-    proxy = URLProxyServer(host=args.host, port=args.port)
-    proxy.run()
+    
+    if args.workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error("이 플랫폼은 SO_REUSEPORT 를 지원하지 않아 --workers 를 사용할 수 없습니다.")
+    
+    log_level = getattr(logging, args.log_level)
+    options = dict(host=args.host, port=args.port,
+                   batch_window=args.batch_window_ms / 1000.0,
+                   batch_max_size=args.batch_max_size,
+                   pool_size=args.pool_size,
+                   pool_size_per_host=args.pool_size_per_host,
+                   classifier_pool_size=args.classifier_pool_size,
+                   keepalive_timeout=args.keepalive_timeout,
+                   dns_cache_ttl=args.dns_cache_ttl,
+                   stream_chunk_size=args.stream_chunk_size,
+                   tunnel_buffer_size=args.tunnel_buffer_size,
+                   tunnel_idle_timeout=args.tunnel_idle_timeout,
+                   tunnel_connect_timeout=args.tunnel_connect_timeout,
+                   upstream_connect_timeout=args.upstream_connect_timeout,
+                   upstream_read_timeout=args.upstream_read_timeout,
+                   cache_size=args.cache_size,
+                   cache_benign_ttl=args.cache_ttl_benign,
+                   cache_malicious_ttl=args.cache_ttl_malicious,
+                   whitelist_files=args.whitelist_file,
+                   blacklist_files=args.blacklist_file,
+                   list_reload_interval=args.list_reload_interval,
+                   classifier=args.classifier,
+                   model_path=args.model_path,
+                   classifier_workers=args.classifier_workers,
+                   classifier_executor=args.classifier_executor,
+                   classifier_address=args.classifier_address,
+                   audit_flush_interval=args.audit_flush_interval,
+                   audit_max_bytes=args.audit_max_bytes,
+                   audit_compress=args.audit_compress,
+                   log_sample_rate=args.log_sample_rate,
+                   log_headers=args.log_headers,
+                   server_timing=args.server_timing,
+                   slow_request_ms=args.slow_request_ms,
+                   profile_sample_rate=args.profile_sample_rate,
+                   profile_backend=args.profile_backend,
+                   profile_dump_every=args.profile_dump_every,
+                   metrics_dir=args.metrics_dir)
+    
+    if args.workers <= 1:
+        log_listener = setup_logging(log_level)
+        proxy = URLProxyServer(**options)
+        try:
+            proxy.run(shutdown_timeout=args.drain_timeout)
+        finally:
+            # 큐에 남은 로그를 모두 쓰고 종료
+            log_listener.stop()
+        return
+    
+    # 관리자 프로세스는 fork 전에 스레드를 만들지 않도록 로그를 바로 파일에 씀
+    setup_logging(log_level, background=False, with_pid=True)
+    
+    # 이전 실행에서 남은 지표 파일 정리 (작업자는 시작할 때 새 파일에 기록)
+    options['metrics_dir'] = options['metrics_dir'] or os.path.join(LOG_DIR, f'proxy_metrics_{args.port}')
+    remove_stale_snapshots(options['metrics_dir'])
+    
+    def run_worker(index):
+        # 작업자마다 로그 스레드 / 세션 / 캐시를 새로 만듦
+        worker_listener = setup_logging(log_level, with_pid=True)
+        proxy = URLProxyServer(worker_index=index, **options)
+        try:
+            proxy.run(reuse_port=True, shutdown_timeout=args.drain_timeout)
+        finally:
+            worker_listener.stop()
+    
+    logger.info(f"URL 프록시 서버 시작 - {args.host}:{args.port} (작업자 {args.workers}개, SO_REUSEPORT)")
+    WorkerSupervisor(run_worker, args.workers, drain_timeout=args.drain_timeout).run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import re
+import signal
+import threading
+import time
+
+from domain_matcher import normalize_hostname
+
+logger = logging.getLogger('rule_manager')
+
+# 기존 규칙 파일에서 도메인 / sid 를 찾기 위한 패턴
+_CONTENT_RE = re.compile(r'http\.host;\s*content:"([^"]+)"')
+_SID_RE = re.compile(r'\bsid:\s*(\d+)\s*;')
+
+# Suricata content 값에 그대로 넣을 수 있는 호스트명만 허용
+_SAFE_DOMAIN_RE = re.compile(r'^[a-z0-9._-]+$')
+
+RULE_TEMPLATE = ('drop http any any -> any any (msg:"Malicious URL blocked: {domain}"; '
+                 'http.host; content:"{domain}"; sid:{sid}; rev:1;)')
+
+class SuricataRuleManager:
+    """도메인별 차단 규칙을 메모리 색인으로 관리하고 모아서 파일에 쓰는 클래스
+
+    규칙 파일은 시작할 때 한 번만 읽어 도메인 / sid 색인을 만들고, 이후 추가된 규칙은
+    reload_interval 마다 한 번씩 임시 파일에 전체를 쓴 뒤 이름을 바꿔 교체한다.
+    Suricata 에는 그 주기당 최대 한 번만 USR2 를 보낸다.
+    """
+
+    def __init__(self, rules_path, pid_file='/var/run/suricata.pid', reload_interval=5.0,
+                 sid_base=9000000, sid_range=1000000):
+        self.rules_path = rules_path
+        self.pid_file = pid_file
+        self.reload_interval = reload_interval
+        self.sid_base = sid_base
+        self.sid_range = sid_range
+
+        self.rules_by_domain = {}
+        self.domains_by_sid = {}
+        self.other_lines = []
+        # 보존한 다른 규칙(주석 처리된 규칙 포함)이 쓰는 sid, 새 규칙에는 배정하지 않음
+        self.reserved_sids = set()
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """규칙 파일을 읽어 색인 생성 (이 관리자가 만들지 않은 줄은 그대로 보존)"""
+        with self._lock:
+            self.rules_by_domain.clear()
+            self.domains_by_sid.clear()
+            self.other_lines = []
+            self.reserved_sids = set()
+            if not os.path.exists(self.rules_path):
+                return
+
+            with open(self.rules_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    line = line.rstrip('\n')
+                    if not line.strip():
+                        continue
+                    content = _CONTENT_RE.search(line)
+                    sid = _SID_RE.search(line)
+                    if line.lstrip().startswith('#') or not content or not sid:
+                        self.other_lines.append(line)
+                        continue
+                    domain = content.group(1).lower()
+                    if domain in self.rules_by_domain:
+                        # 예전 방식으로 중복 추가된 규칙은 하나만 남김
+                        self._dirty = True
+                        continue
+                    self.rules_by_domain[domain] = line
+                    self.domains_by_sid[int(sid.group(1))] = domain
+
+            # 이전 구현은 sid 가 겹칠 수 있었으므로 다른 규칙과 겹치는 sid 가 있는지 확인
+            self.reserved_sids = {int(sid.group(1)) for sid in map(_SID_RE.search, self.other_lines) if sid}
+            for sid in sorted(self.reserved_sids.intersection(self.domains_by_sid)):
+                logger.warning(f"다른 규칙과 sid 가 겹침: {sid}")
+
+        logger.info(f"Suricata 규칙 로드: {len(self.rules_by_domain)}개 도메인 ({self.rules_path})")
+
+    def sid_for(self, domain):
+        """도메인에서 항상 같은 sid 를 계산 (다른 도메인이나 보존한 규칙과 겹치면 다음 번호로 이동)"""
+        digest = hashlib.sha1(domain.encode('utf-8')).digest()
+        offset = int.from_bytes(digest[:8], 'big') % self.sid_range
+        for step in range(self.sid_range):
+            sid = self.sid_base + (offset + step) % self.sid_range
+            if sid in self.reserved_sids:
+                continue
+            owner = self.domains_by_sid.get(sid)
+            if owner is None or owner == domain:
+                return sid
+        raise RuntimeError("사용 가능한 sid 가 없습니다.")
+
+    def has_domain(self, domain):
+        return normalize_hostname(domain) in self.rules_by_domain
+
+    def block_domain(self, domain):
+        """도메인 차단 규칙 추가 (새로 추가했으면 True, 이미 있으면 False)"""
+        domain = normalize_hostname(domain)
+        if not domain or not _SAFE_DOMAIN_RE.match(domain):
+            logger.warning(f"규칙으로 만들 수 없는 도메인: {domain!r}")
+            return False
+
+        with self._lock:
+            if domain in self.rules_by_domain:
+                return False
+            sid = self.sid_for(domain)
+            rule = RULE_TEMPLATE.format(domain=domain, sid=sid)
+            self.rules_by_domain[domain] = rule
+            self.domains_by_sid[sid] = domain
+            self._dirty = True
+
+        logger.info(f"Rule added: {rule}")
+        return True
+
+    def flush(self):
+        """변경 사항이 있으면 규칙 파일을 교체하고 Suricata 재로드 (변경이 있었으면 True)"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            lines = self.other_lines + list(self.rules_by_domain.values())
+            self._dirty = False
+
+        try:
+            self._write(lines)
+        except OSError as e:
+            logger.error(f"Suricata 규칙 파일 쓰기 중 오류: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+        self.reload_suricata()
+        return True
+
+    def _write(self, lines):
+        directory = os.path.dirname(self.rules_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".{os.path.basename(self.rules_path)}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.rules_path)
+
+    def reload_suricata(self):
+        """Suricata 에 규칙 재로드 시그널(USR2) 전송"""
+        try:
+            if not os.path.exists(self.pid_file):
+                logger.warning("Suricata PID file not found, rules won't be reloaded")
+                return
+            with open(self.pid_file, 'r') as f:
+                pid = int(f.read().strip())
+            os.kill(pid, signal.SIGUSR2)
+            logger.info(f"Sent reload signal to Suricata (PID: {pid}, 규칙: {len(self.rules_by_domain)}개)")
+        except (OSError, ValueError) as e:
+            logger.error(f"Suricata 재로드 중 오류: {e}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.reload_interval):
+            self.flush()
+
+    def start(self):
+        """규칙 파일 쓰기 / 재로드 스레드 시작"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='rule-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """스레드를 멈추고 남은 변경 사항 저장"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.reload_interval + 1)
+            self._thread = None
+        self.flush()
+
+    def __len__(self):
+        return len(self.rules_by_domain)
@@ -7,20 +7,25 @@ mkdir -p /etc/suricata/rules
 
 echo "=== URL Blocker 시스템 시작 ==="
 
-# Flask 서버 시작 (백그라운드)
+# Flask 서버 시작 (백그라운드, gunicorn 다중 작업자)
 echo "Starting Flask server..."
-python app.py &
+gunicorn -c gunicorn.conf.py app:app &
 FLASK_PID=$!
 
-# 3초 대기하여 Flask 서버가 시작되도록 함
-sleep 3
+# 모든 작업자가 모델을 로드할 때까지 대기 (최대 60초)
+for i in $(seq 1 60); do
+    if curl -sf http://localhost:5000/ready > /dev/null; then
+        break
+    fi
+    sleep 1
+done
 
 # 프록시 서버 시작 (백그라운드)
 echo "Starting Proxy server..."
-python proxy_server.py --host 0.0.0.0 --port 8888 &
+python proxy_server.py --host 0.0.0.0 --port 8888 --workers "${PROXY_WORKERS:-1}" &
 PROXY_PID=$!
 
-# url_blocker_manager.py를 통한 관리
+# url_blocker_manager.py를 통한 관리 (위에서 띄운 Flask / 프록시는 건너뛰고 Suricata 모니터만 시작)
 echo "Starting URL Blocker Manager..."
 python url_blocker_manager.py start
 
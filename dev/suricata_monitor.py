@@ -3,13 +3,22 @@ import json
 import requests
 import re
 import logging
-import subprocess
 from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import time
 import os
-from urllib.parse import urlparse
+import queue
+import signal
+import threading
+from collections import OrderedDict
+
+from audit_log import AuditLogWriter
+from classifier_protocol import ClassifierClient
+from domain_matcher import DomainMatcher, ReloadableDomainList, normalize_hostname
+from eve_tailer import EveTailer, JSON_BACKEND
+from monitor_state import OffsetCheckpoint, OffsetTracker, VerdictStore
+from rule_manager import SuricataRuleManager
 
 # 로그 디렉토리 설정
 LOG_DIR = "/var/log/url_blocker"
@@ -30,15 +39,65 @@ logger = logging.getLogger('suricata_monitor')
 FLASK_SERVER_URL = os.environ.get('FLASK_SERVER_URL', 'http://url-classifier:5000/predict')
 logger.info(f"Using Flask server URL: {FLASK_SERVER_URL}")
 
+# Flask 일괄 분류 URL (기본값: FLASK_SERVER_URL 과 같은 서버의 /predict_batch)
+FLASK_BATCH_URL = os.environ.get('FLASK_BATCH_URL', FLASK_SERVER_URL.rsplit('/', 1)[0] + '/predict_batch')
+
+# 바이너리 프로토콜 분류 서비스 주소 (지정하면 Flask 대신 사용, 예: unix:/tmp/url_classifier.sock)
+CLASSIFIER_ADDRESS = os.environ.get('CLASSIFIER_ADDRESS')
+
+# 분류 단계 설정 (동시에 처리 중인 분류 요청 수 = 작업자 수)
+CLASSIFY_WORKERS = int(os.environ.get('CLASSIFY_WORKERS', '4'))
+CLASSIFY_BATCH_SIZE = int(os.environ.get('CLASSIFY_BATCH_SIZE', '64'))
+CLASSIFY_BATCH_WAIT = float(os.environ.get('CLASSIFY_BATCH_WAIT', '0.05'))
+CLASSIFY_TIMEOUT = float(os.environ.get('CLASSIFY_TIMEOUT', '5'))
+
+# 단계 사이 큐 크기 (가득 차면 앞 단계가 기다림)
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', '10000'))
+URL_QUEUE_SIZE = int(os.environ.get('URL_QUEUE_SIZE', '10000'))
+
+# 정상으로 판정된 URL 을 다시 분류하지 않는 시간 (초) / 최대 기억 개수
+DEDUP_TTL = float(os.environ.get('DEDUP_TTL', '300'))
+BLOCKED_TTL = float(os.environ.get('BLOCKED_TTL', str(7 * 24 * 3600)))
+DEDUP_MAX_ENTRIES = int(os.environ.get('DEDUP_MAX_ENTRIES', '100000'))
+
+# Flask 응답에서 사용하는 항목 (특성은 받지 않음)
+PREDICT_FIELDS = 'is_malicious,probability'
+
 # Suricata 규칙 파일 경로
 SURICATA_RULES_PATH = '/etc/suricata/rules/malicious_urls.rules'
 
+# Suricata PID 파일 (규칙 재로드 시그널 전송용)
+SURICATA_PID_FILE = os.environ.get('SURICATA_PID_FILE', '/var/run/suricata.pid')
+
+# 규칙 파일 쓰기 / Suricata 재로드 최소 간격 (초)
+RULE_RELOAD_INTERVAL = float(os.environ.get('RULE_RELOAD_INTERVAL', '5'))
+
+# 도메인 전체를 차단하기 시작하는 악성 판정 URL 수 (1 이면 첫 악성 URL 에서 바로 도메인 차단)
+DOMAIN_BLOCK_THRESHOLD = int(os.environ.get('DOMAIN_BLOCK_THRESHOLD', '1'))
+
 # Suricata EVE 로그 경로
 SURICATA_EVE_LOG = '/var/log/suricata/eve.json'
 
+# EVE 로그 한 번에 읽는 크기 (바이트)
+EVE_READ_CHUNK = int(os.environ.get('EVE_READ_CHUNK', str(1024 * 1024)))
+
+# 재시작 후 이어서 처리하기 위한 상태 파일 디렉토리 (EVE 읽은 위치, 판정 결과)
+STATE_DIR = os.environ.get('STATE_DIR', LOG_DIR)
+CHECKPOINT_FILE = os.path.join(STATE_DIR, 'eve_checkpoint.json')
+VERDICT_DB_FILE = os.path.join(STATE_DIR, 'verdicts.sqlite3')
+
+# 읽은 위치 저장 주기 (초) / 종료 시 남은 이벤트 처리 대기 시간 (초)
+CHECKPOINT_INTERVAL = float(os.environ.get('CHECKPOINT_INTERVAL', '5'))
+DRAIN_TIMEOUT = float(os.environ.get('DRAIN_TIMEOUT', '10'))
+
 # 차단 로그 파일
 BLOCK_LOG_FILE = '/var/log/url_blocker/blocked_urls.log'
 
+# 차단 로그 쓰기 주기 (초) / 회전 크기 (바이트) / 회전 파일 압축 여부
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '1'))
+AUDIT_MAX_BYTES = int(os.environ.get('AUDIT_MAX_BYTES', str(100 * 1024 * 1024)))
+AUDIT_COMPRESS = os.environ.get('AUDIT_COMPRESS', '').lower() in ('1', 'true', 'yes')
+
 # 차단된 URL 캐시 (중복 확인용)
 blocked_urls_cache = set()
 
@@ -73,65 +132,293 @@ WHITELIST_DOMAINS = [
     '127.0.0.1'
 ]
 
+# 추가 화이트리스트 / 차단 목록 파일 (콜론으로 구분하여 여러 개 지정 가능)
+WHITELIST_FILES = [path for path in os.environ.get('WHITELIST_FILES', '').split(':') if path]
+BLACKLIST_FILES = [path for path in os.environ.get('BLACKLIST_FILES', '').split(':') if path]
+
+# 목록 파일 변경 확인 주기 (초)
+LIST_RELOAD_INTERVAL = float(os.environ.get('LIST_RELOAD_INTERVAL', '5'))
+
+WHITELIST = ReloadableDomainList(WHITELIST_FILES, WHITELIST_DOMAINS,
+                                 interval=LIST_RELOAD_INTERVAL, name='화이트리스트')
+BLACKLIST = ReloadableDomainList(BLACKLIST_FILES,
+                                 interval=LIST_RELOAD_INTERVAL, name='차단 목록')
+
 def is_whitelisted(url):
     """URL이 화이트리스트에 있는지 확인"""
     try:
-        parsed = urlparse(url)
-        hostname = parsed.netloc.lower()
-        
-        if ':' in hostname:
-            hostname = hostname.split(':')[0]
-        
-        for whitelist_domain in WHITELIST_DOMAINS:
-            if hostname == whitelist_domain or hostname.endswith('.' + whitelist_domain):
-                return True
-        
-        return False
+        return WHITELIST.matches(url)
     except Exception as e:
         logger.error(f"화이트리스트 확인 중 오류: {e}")
         return False
 
+def is_blacklisted(url):
+    """URL이 차단 목록에 있는지 확인"""
+    try:
+        return BLACKLIST.matches(url)
+    except Exception as e:
+        logger.error(f"차단 목록 확인 중 오류: {e}")
+        return False
+
+class RecentURLs:
+    """최근 분류한 URL 을 TTL 동안 기억하는 LRU (같은 URL 반복 분류 방지)"""
+    
+    def __init__(self, ttl=300.0, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def add(self, url, ttl=None):
+        with self._lock:
+            self._entries[url] = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def __contains__(self, url):
+        with self._lock:
+            expires = self._entries.get(url)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[url]
+                return False
+            return True
+
+class DomainAggregator:
+    """도메인별 악성 판정 수를 세다가 기준을 넘으면 도메인 전체를 차단 목록에 올리는 클래스
+    
+    차단된 도메인(과 하위 도메인)의 URL 은 모델을 거치지 않고 바로 차단하므로
+    경로만 바꿔 가며 뿌리는 공격에서도 분류 요청 수와 규칙 수가 도메인 수로 제한된다.
+    """
+    
+    def __init__(self, threshold=1, domains=()):
+        self.threshold = max(threshold, 1)
+        self.counts = {}
+        self.blocked = DomainMatcher(domains)
+        self._lock = threading.Lock()
+    
+    def blocked_domain(self, hostname):
+        """호스트명이 차단된 도메인에 속하면 그 도메인 반환"""
+        return self.blocked.match_host(hostname)
+    
+    def record_malicious(self, domain, force=False):
+        """악성 판정 기록 후 이번에 기준을 넘어 차단해야 하면 True"""
+        with self._lock:
+            if self.blocked.match_host(domain) is not None:
+                return False
+            count = self.counts.get(domain, 0) + 1
+            if not force and count < self.threshold:
+                self.counts[domain] = count
+                return False
+            self.counts.pop(domain, None)
+            self.blocked.add(domain)
+            return True
+
 class SuricataLogHandler(FileSystemEventHandler):
-    """Suricata EVE JSON 로그를 모니터링하는 핸들러"""
+    """Suricata EVE JSON 로그를 모니터링하는 핸들러
+    
+    읽기 -> 필터(화이트리스트 / 중복 제거) -> 분류 단계를 각각의 스레드에서 실행하고
+    단계 사이는 크기가 정해진 큐로 연결한다. 분류가 느려도 watchdog 콜백은 막히지 않으며,
+    큐가 가득 차면 앞 단계가 기다리므로 이벤트를 버리지 않는다.
+    """
     
     def __init__(self):
-        self.file_position = 0
         # EVE 로그 파일이 없을 경우 빈 파일 생성
         if not os.path.exists(SURICATA_EVE_LOG):
             open(SURICATA_EVE_LOG, 'a').close()
             logger.info(f"Created empty Suricata log file: {SURICATA_EVE_LOG}")
-        else:
-            self.file_position = os.path.getsize(SURICATA_EVE_LOG)
-            logger.info(f"Found existing Suricata log file, size: {self.file_position}")
+        
+        os.makedirs(STATE_DIR, exist_ok=True)
+        self.checkpoint = OffsetCheckpoint(CHECKPOINT_FILE)
+        self.verdict_store = VerdictStore(VERDICT_DB_FILE, benign_ttl=DEDUP_TTL, malicious_ttl=BLOCKED_TTL)
+        
+        # 파일을 열어 둔 채로 이어서 읽음 (회전 / 잘림은 tailer 가 처리)
+        self.tailer = EveTailer(SURICATA_EVE_LOG, event_types=('http',), chunk_size=EVE_READ_CHUNK)
+        self.tailer.open(position=self.resume_position())
+        logger.info(f"Found existing Suricata log file, size: {self.tailer.offset} (JSON: {JSON_BACKEND})")
+        
+        # 체크포인트에는 읽은 위치가 아니라 분류 / 저장까지 끝난 이벤트의 위치만 기록
+        self.offsets = OffsetTracker()
+        if self.tailer.inode is not None:
+            self.offsets.advance(self.tailer.inode, self.tailer.offset)
+        
+        self.event_queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.url_queue = queue.Queue(maxsize=URL_QUEUE_SIZE)
+        self.recent_urls = RecentURLs(DEDUP_TTL, DEDUP_MAX_ENTRIES)
+        self.restore_verdicts()
+        
+        # 분류 대기 / 진행 중인 URL (같은 URL 이 동시에 여러 번 분류되지 않도록)
+        self.pending_urls = set()
+        self.pending_lock = threading.Lock()
+        
+        # 차단 캐시는 여러 분류 작업자가 함께 사용
+        self.block_lock = threading.Lock()
+        
+        # 차단 로그는 백그라운드 스레드가 모아서 기록
+        self.audit_log = AuditLogWriter(BLOCK_LOG_FILE, flush_interval=AUDIT_FLUSH_INTERVAL,
+                                        max_bytes=AUDIT_MAX_BYTES, compress=AUDIT_COMPRESS)
+        
+        # 규칙 파일은 시작할 때 한 번만 읽어 도메인 / sid 색인 생성
+        self.rule_manager = SuricataRuleManager(SURICATA_RULES_PATH, pid_file=SURICATA_PID_FILE,
+                                                reload_interval=RULE_RELOAD_INTERVAL)
+        self.rule_manager.load()
+        
+        # 규칙 파일에 이미 있는 도메인은 차단된 도메인으로 시작
+        self.domains = DomainAggregator(DOMAIN_BLOCK_THRESHOLD, self.rule_manager.rules_by_domain)
+        
+        self._wakeup = threading.Event()
+        self._stop_reading = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads = []
+    
+    def resume_position(self):
+        """체크포인트가 현재 EVE 파일의 것이면 그 위치, 아니면 None (tailer 기본 위치)"""
+        saved = self.checkpoint.load()
+        if saved is None:
+            return None
+        
+        inode, offset = saved
+        st = os.stat(SURICATA_EVE_LOG)
+        if st.st_ino == inode and offset <= st.st_size:
+            logger.info(f"체크포인트에서 이어서 읽음 - 위치: {offset} (남은 크기: {st.st_size - offset})")
+            return offset
+        
+        # 멈춰 있는 동안 로그가 회전되었으면 새 파일 전체를 읽음
+        logger.warning("체크포인트 이후 EVE 로그가 회전됨 - 현재 파일의 처음부터 읽음")
+        return 0
+    
+    def restore_verdicts(self):
+        """저장된 판정 결과로 중복 확인용 메모리 캐시를 채움"""
+        restored = self.verdict_store.load_recent(DEDUP_MAX_ENTRIES, DEDUP_MAX_ENTRIES)
+        for url, is_malicious, remaining in reversed(restored):
+            if is_malicious:
+                blocked_urls_cache.add(url)
+            else:
+                self.recent_urls.add(url, ttl=remaining)
+        if restored:
+            logger.info(f"저장된 판정 결과 {len(restored)}건 복원")
+    
+    def save_checkpoint(self):
+        position = self.offsets.committed()
+        if position is None:
+            return
+        try:
+            self.checkpoint.save(*position)
+        except OSError as e:
+            logger.error(f"체크포인트 저장 중 오류: {e}")
+    
+    def checkpoint_loop(self):
+        """처리가 끝난 위치를 주기적으로 저장하고 만료된 판정 결과 정리"""
+        last_purge = time.monotonic()
+        while not self._stop_event.wait(CHECKPOINT_INTERVAL):
+            self.save_checkpoint()
+            if time.monotonic() - last_purge > 3600:
+                last_purge = time.monotonic()
+                try:
+                    deleted = self.verdict_store.purge_expired()
+                    logger.info(f"만료된 판정 결과 {deleted}건 삭제")
+                except Exception as e:
+                    logger.error(f"판정 결과 정리 중 오류: {e}")
     
     def on_modified(self, event):
         if event.src_path == SURICATA_EVE_LOG:
+            # 실제 읽기는 읽기 스레드에서 수행 (watchdog 스레드를 막지 않음)
+            self._wakeup.set()
+    
+    def on_created(self, event):
+        # 로그 회전으로 새 파일이 생긴 경우
+        if event.src_path == SURICATA_EVE_LOG:
+            self._wakeup.set()
+    
+    def start(self):
+        """읽기 / 필터 / 분류 스레드 시작"""
+        self._stop_event.clear()
+        targets = [('eve-reader', self.read_loop), ('event-filter', self.filter_loop),
+                   ('checkpoint', self.checkpoint_loop)]
+        for index in range(CLASSIFY_WORKERS):
+            targets.append((f"classifier-{index}", self.classify_loop))
+        
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.rule_manager.start()
+        self.audit_log.start()
+        logger.info(f"모니터링 파이프라인 시작 - 분류 작업자: {CLASSIFY_WORKERS}, 배치 크기: {CLASSIFY_BATCH_SIZE}")
+    
+    def stop(self):
+        """읽기를 멈추고 이미 읽은 이벤트를 처리한 뒤 읽은 위치를 저장하고 종료"""
+        self._stop_reading.set()
+        self._wakeup.set()
+        self._threads[0].join(timeout=DRAIN_TIMEOUT)
+        
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while time.monotonic() < deadline:
+            if not self.offsets.pending():
+                break
+            time.sleep(0.1)
+        else:
+            logger.warning("종료 대기 시간 초과 - 처리하지 못한 이벤트가 있을 수 있음")
+        
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=CLASSIFY_TIMEOUT + 1)
+        self._threads = []
+        
+        self.rule_manager.stop()
+        self.audit_log.close()
+        self.save_checkpoint()
+        self.tailer.close()
+        self.verdict_store.close()
+    
+    def put(self, target_queue, item):
+        """큐에 넣되 종료 요청이 오면 포기 (가득 찬 동안은 기다림)"""
+        while not self._stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def read_loop(self):
+        """읽기 단계: 파일 변경 알림(또는 1초 주기)마다 새 로그를 읽음"""
+        while not self._stop_reading.is_set():
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
             self.process_new_logs()
     
     def process_new_logs(self):
-        """새로운 로그 라인을 처리"""
+        """새로운 HTTP 이벤트를 읽어 필터 단계로 전달"""
         try:
-            with open(SURICATA_EVE_LOG, 'r') as f:
-                f.seek(self.file_position)
-                
-                for line in f:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        
-                        # HTTP 이벤트만 처리
-                        if log_entry.get('event_type') == 'http':
-                            self.process_http_event(log_entry)
-                    
-                    except json.JSONDecodeError:
-                        continue
-                
-                self.file_position = f.tell()
+            for log_entry in self.tailer.read_events():
+                # 이벤트마다 그 줄 다음 위치를 함께 넘겨 처리가 끝나면 완료 표시
+                entry = self.offsets.add(self.tailer.inode, self.tailer.offset)
+                if not self.put(self.event_queue, (entry, log_entry)) or self._stop_reading.is_set():
+                    return
+            
+            # 대상이 아닌 줄만 읽은 경우에도 읽은 위치 갱신
+            if self.tailer.inode is not None:
+                self.offsets.advance(self.tailer.inode, self.tailer.offset)
         
         except Exception as e:
             logger.error(f"로그 처리 중 오류: {e}")
     
-    def process_http_event(self, event):
-        """HTTP 이벤트에서 URL 추출 및 검사"""
+    def filter_loop(self):
+        """필터 단계: 화이트리스트 / 중복 / 차단 목록 확인 후 분류 단계로 전달"""
+        while not self._stop_event.is_set():
+            try:
+                entry, event = self.event_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # 분류 단계로 넘긴 이벤트는 분류 작업자가 완료 표시
+            if not self.process_http_event(event, entry):
+                self.offsets.done(entry)
+    
+    def process_http_event(self, event, entry=None):
+        """HTTP 이벤트에서 URL 추출 및 검사 (분류 단계에서 완료 표시할 이벤트면 True)"""
         try:
             http_data = event.get('http', {})
             hostname = http_data.get('hostname', '')
@@ -145,52 +432,165 @@ class SuricataLogHandler(FileSystemEventHandler):
                 logger.debug(f"화이트리스트 URL: {full_url}")
                 return
             
-            # 이미 차단된 URL인지 확인
-            if full_url in blocked_urls_cache:
+            # 이미 차단되었거나 최근에 정상으로 판정된 URL 인지 확인
+            if full_url in blocked_urls_cache or full_url in self.recent_urls:
                 return
             
-            # Flask 서버에 URL 분류 요청
-            logger.info(f"Checking URL: {full_url}")
-            try:
-                response = requests.post(FLASK_SERVER_URL, json={'url': full_url}, timeout=5)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    probability = result.get('probability', 0)
-                    
-                    logger.info(f"Classification result for {full_url}: {result}")
-                    
-                    if result.get('is_malicious'):
-                        logger.warning(f"악성 URL 탐지: {full_url} - 확률: {probability:.4f}")
-                        self.block_url(full_url, probability, event)
-                else:
-                    logger.error(f"Flask server returned status {response.status_code}: {response.text}")
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Flask 서버 연결 오류: {e}")
+            # 차단된 도메인의 URL 은 분류 없이 바로 차단 (URL 별 캐시에는 넣지 않음)
+            blocked_domain = self.domains.blocked_domain(normalize_hostname(hostname))
+            if blocked_domain is not None:
+                logger.info(f"차단된 도메인 URL: {full_url} ({blocked_domain})")
+                with self.block_lock:
+                    self.log_blocked_url(full_url, 1.0, event)
+                return
+            
+            # 차단 목록에 있으면 분류 없이 바로 도메인 차단
+            if is_blacklisted(full_url):
+                logger.warning(f"차단 목록 URL 탐지: {full_url}")
+                self.block_url(full_url, 1.0, event, block_domain=True)
+                return
+            
+            # 이미 분류 대기 중인 URL 은 건너뜀 (먼저 읽은 이벤트가 완료되기 전에는 체크포인트가 넘어가지 않음)
+            with self.pending_lock:
+                if full_url in self.pending_urls:
+                    return
+                self.pending_urls.add(full_url)
+            
+            # 종료 중이라 큐에 넣지 못한 이벤트도 완료 표시하지 않음 (다음 실행에서 다시 읽음)
+            if not self.put(self.url_queue, (full_url, event, entry)):
+                with self.pending_lock:
+                    self.pending_urls.discard(full_url)
+            return True
             
         except Exception as e:
             logger.error(f"HTTP 이벤트 처리 중 오류: {e}")
     
-    def block_url(self, url, probability, event):
-        """악성 URL을 차단"""
+    def next_batch(self):
+        """분류 대기 URL 을 최대 CLASSIFY_BATCH_SIZE 개까지 CLASSIFY_BATCH_WAIT 동안 모음"""
+        try:
+            batch = [self.url_queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        
+        deadline = time.monotonic() + CLASSIFY_BATCH_WAIT
+        while len(batch) < CLASSIFY_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.url_queue.get(timeout=remaining) if remaining > 0 else self.url_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def classify_loop(self):
+        """분류 단계: 모은 URL 을 한 번의 요청으로 분류하고 악성 URL 차단"""
+        # 작업자마다 연결을 하나씩 유지 (동시에 진행 중인 요청 수 = 작업자 수)
+        if CLASSIFIER_ADDRESS:
+            client = ClassifierClient(CLASSIFIER_ADDRESS, timeout=CLASSIFY_TIMEOUT)
+        else:
+            client = requests.Session()
+        
+        try:
+            while not self._stop_event.is_set():
+                batch = self.next_batch()
+                if not batch:
+                    continue
+                
+                # 대기 중에 도메인이 차단된 URL 은 분류하지 않고 바로 차단
+                remaining = []
+                for url, event, entry in batch:
+                    if self.domains.blocked_domain(normalize_hostname(url)) is None:
+                        remaining.append((url, event, entry))
+                        continue
+                    with self.block_lock:
+                        self.log_blocked_url(url, 1.0, event)
+                    with self.pending_lock:
+                        self.pending_urls.discard(url)
+                    self.offsets.done(entry)
+                batch = remaining
+                if not batch:
+                    continue
+                
+                try:
+                    self.classify_and_store(client, batch)
+                finally:
+                    # 분류에 실패한 이벤트도 실행 중과 같이 다시 분류하지 않으므로 완료로 표시
+                    for _, _, entry in batch:
+                        self.offsets.done(entry)
+        finally:
+            client.close()
+    
+    def classify_and_store(self, client, batch):
+        """[(URL, 이벤트, 위치 토큰), ...] 을 분류하여 악성 URL 을 차단하고 판정 결과 저장"""
+        urls = [url for url, _, _ in batch]
+        logger.info(f"Checking {len(urls)} URLs")
+        verdicts = self.classify_batch(client, urls)
+        
+        for (url, event, _), verdict in zip(batch, verdicts or ()):
+            is_malicious, probability = verdict
+            logger.info(f"Classification result for {url}: 악성: {is_malicious}, 확률: {probability:.4f}")
+            
+            if is_malicious:
+                logger.warning(f"악성 URL 탐지: {url} - 확률: {probability:.4f}")
+                self.block_url(url, probability, event)
+            else:
+                self.recent_urls.add(url)
+        
+        # 재시작 후에도 다시 분류하지 않도록 판정 결과 저장
+        if verdicts:
+            try:
+                self.verdict_store.put_many([(url, is_malicious, probability)
+                                             for url, (is_malicious, probability) in zip(urls, verdicts)])
+            except Exception as e:
+                logger.error(f"판정 결과 저장 중 오류: {e}")
+        
+        # 분류에 실패한 URL 은 다음 이벤트에서 다시 분류되도록 대기 목록에서만 제거
+        with self.pending_lock:
+            self.pending_urls.difference_update(urls)
+    
+    def classify_batch(self, client, urls):
+        """URL 목록의 (악성 여부, 확률) 목록 반환 (실패 시 None)"""
+        if isinstance(client, ClassifierClient):
+            try:
+                verdicts = client.classify(urls)
+                if verdicts is None:
+                    logger.error("분류 서비스가 요청을 처리하지 못했습니다 (과부하 또는 오류)")
+                return verdicts
+            except Exception as e:
+                logger.error(f"분류 서비스 연결 오류: {e}")
+                return None
+        
+        try:
+            response = client.post(FLASK_BATCH_URL, params={'fields': PREDICT_FIELDS},
+                                   json={'urls': urls}, timeout=CLASSIFY_TIMEOUT)
+            
+            if response.status_code == 200:
+                results = response.json().get('results', [])
+                return [(bool(result.get('is_malicious')), result.get('probability', 0)) for result in results]
+            
+            logger.error(f"Flask server returned status {response.status_code}: {response.text}")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Flask 서버 연결 오류: {e}")
+        return None
+    
+    def block_url(self, url, probability, event, block_domain=False):
+        """악성 URL을 차단 (도메인 판정 수가 기준을 넘으면 도메인 차단 규칙 추가)"""
+        with self.block_lock:
+            self._block_url(url, probability, event, block_domain)
+    
+    def _block_url(self, url, probability, event, block_domain):
         try:
-            # URL에서 도메인 추출
-            parsed = urlparse(url)
-            domain = parsed.netloc
+            # URL에서 도메인 추출 (포트 제외)
+            domain = normalize_hostname(url)
             
             # 도메인이 비어있으면 처리하지 않음
             if not domain:
                 logger.warning(f"도메인을 추출할 수 없음: {url}")
                 return
             
-            logger.info(f"Blocking domain: {domain}")
-            
-            # Suricata 규칙 생성
-            rule_id = abs(hash(url)) % 1000000
-            rule = f'drop http any any -> any any (msg:"Malicious URL blocked: {domain}"; http.host; content:"{domain}"; sid:{rule_id}; rev:1;)'
-            
-            # 규칙 추가
-            self.add_suricata_rule(rule)
+            # 기준을 넘으면 도메인 규칙 추가 (파일 쓰기와 Suricata 재로드는 규칙 관리자가 모아서 처리)
+            if self.domains.record_malicious(domain, force=block_domain):
+                if self.rule_manager.block_domain(domain):
+                    logger.info(f"Blocking domain: {domain}")
             
             # 캐시에 추가
             blocked_urls_cache.add(url)
@@ -201,48 +601,9 @@ class SuricataLogHandler(FileSystemEventHandler):
         except Exception as e:
             logger.error(f"URL 차단 중 오류: {e}")
     
-    def add_suricata_rule(self, rule):
-        """Suricata 규칙 파일에 규칙 추가"""
-        try:
-            # 규칙 파일이 없으면 생성
-            if not os.path.exists(SURICATA_RULES_PATH):
-                open(SURICATA_RULES_PATH, 'a').close()
-                logger.info(f"Created rules file: {SURICATA_RULES_PATH}")
-            
-            # 규칙이 이미 존재하는지 확인
-            with open(SURICATA_RULES_PATH, 'r') as f:
-                if rule in f.read():
-                    logger.info("Rule already exists, skipping")
-                    return
-            
-            # 규칙 추가
-            with open(SURICATA_RULES_PATH, 'a') as f:
-                f.write(f"\n{rule}\n")
-            
-            logger.info(f"Rule added: {rule}")
-            
-            # Suricata 재로드 (Docker 환경에서는 PID가 다를 수 있음)
-            try:
-                # PID 파일에서 PID 읽기 (Docker 환경에 맞게 조정)
-                if os.path.exists('/var/run/suricata.pid'):
-                    with open('/var/run/suricata.pid', 'r') as f:
-                        pid = f.read().strip()
-                    # USR2 시그널 보내기
-                    subprocess.run(['kill', '-USR2', pid], check=True)
-                    logger.info(f"Sent reload signal to Suricata (PID: {pid})")
-                else:
-                    logger.warning("Suricata PID file not found, rules won't be reloaded")
-            except Exception as e:
-                logger.error(f"Suricata 재로드 중 오류: {e}")
-            
-        except Exception as e:
-            logger.error(f"Suricata 규칙 추가 중 오류: {e}")
-    
     def log_blocked_url(self, url, probability, event):
         """차단된 URL 로그 기록"""
         try:
-            os.makedirs(os.path.dirname(BLOCK_LOG_FILE), exist_ok=True)
-            
             log_entry = {
                 'timestamp': datetime.now().isoformat(),
                 'url': url,
@@ -252,8 +613,7 @@ class SuricataLogHandler(FileSystemEventHandler):
                 'user_agent': event.get('http', {}).get('http_user_agent', '')
             }
             
-            with open(BLOCK_LOG_FILE, 'a') as f:
-                f.write(json.dumps(log_entry) + '\n')
+            self.audit_log.write(log_entry)
             
             logger.info(f"Blocked URL logged: {url}")
             
@@ -281,6 +641,16 @@ def main():
     
     observer.schedule(event_handler, path=os.path.dirname(SURICATA_EVE_LOG), recursive=False)
     observer.start()
+    event_handler.start()
+    
+    # 화이트리스트 / 차단 목록 파일 감시 시작
+    WHITELIST.start()
+    BLACKLIST.start()
+    
+    # docker stop 등의 SIGTERM 도 Ctrl+C 와 같이 정상 종료 (읽은 위치 저장)
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handle_sigterm)
     
     try:
         logger.info("Observer started, waiting for events...")
@@ -288,6 +658,9 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
+        event_handler.stop()
+        WHITELIST.stop()
+        BLACKLIST.stop()
         logger.info("Suricata 로그 모니터링 종료")
     
     observer.join()
@@ -0,0 +1,9 @@
+# dev/ 의 모듈은 패키지가 아니라 같은 디렉토리에서 바로 가져오므로 경로에 추가
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 모듈을 가져올 때 만드는 로그 파일이 실제 로그 디렉토리에 쌓이지 않도록 임시 디렉토리 사용
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='url_classifier_test_'))
@@ -0,0 +1,29 @@
+import glob
+import gzip
+import json
+import os
+
+from audit_log import AuditLogWriter
+
+def read_records(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+def test_rotates_by_written_bytes(tmp_path):
+    path = str(tmp_path / 'blocked_urls.log')
+    writer = AuditLogWriter(path, batch_size=1, max_bytes=200, rotate_daily=False, compress=True)
+    writer.start()
+    for i in range(10):
+        writer.write({'url': f'http://예시.example/{i}', 'probability': 0.9})
+    writer.close()
+
+    assert os.path.getsize(path) <= 200
+    rotated = sorted(glob.glob(path + '.*'))
+    assert rotated and all(name.endswith('.gz') for name in rotated)
+    for name in rotated:
+        with gzip.open(name, 'rb') as f:
+            assert len(f.read()) <= 200
+
+    urls = [record['url'] for name in rotated + [path] for record in read_records(name)]
+    assert sorted(urls) == sorted(f'http://예시.example/{i}' for i in range(10))
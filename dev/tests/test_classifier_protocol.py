@@ -0,0 +1,260 @@
+import asyncio
+import os
+
+import pytest
+
+import classifier_protocol
+from classifier_protocol import (HEADER, MAX_URL_BYTES, STATUS_ERROR, STATUS_OK, STATUS_OVERLOADED,
+                                 AsyncClassifierClient, ClassifierClient, ProtocolError,
+                                 decode_request_body, decode_response_body, encode_request,
+                                 encode_response, read_frame)
+
+def split_frame(frame):
+    length, request_id, status, count = HEADER.unpack_from(frame)
+    body = frame[HEADER.size:]
+    assert len(body) == length
+    return request_id, status, count, body
+
+def test_request_round_trip():
+    urls = ['http://example.com/', '', 'https://한국.example/경로?q=값', 'x' * 300]
+    request_id, status, count, body = split_frame(encode_request(7, urls))
+    assert (request_id, status, count) == (7, STATUS_OK, len(urls))
+    assert decode_request_body(body, count) == urls
+
+def test_request_truncates_long_url():
+    request_id, _, count, body = split_frame(encode_request(1, ['a' * (MAX_URL_BYTES + 10)]))
+    assert decode_request_body(body, count) == ['a' * MAX_URL_BYTES]
+
+def test_response_round_trip():
+    verdicts = [(0.25, False), (0.75, True), (1.0, True)]
+    request_id, status, count, body = split_frame(encode_response(9, verdicts))
+    assert (request_id, status, count) == (9, STATUS_OK, 3)
+    assert decode_response_body(body, count) == [(False, 0.25), (True, 0.75), (True, 1.0)]
+
+@pytest.mark.parametrize('status', [STATUS_OVERLOADED, STATUS_ERROR])
+def test_error_response_has_empty_body(status):
+    assert split_frame(encode_response(3, [(0.9, True)], status)) == (3, status, 0, b'')
+
+def test_truncated_url_length_is_protocol_error():
+    _, _, count, body = split_frame(encode_request(1, ['http://a/', 'http://b/']))
+    # 두 번째 URL 의 길이 필드 중간에서 잘림
+    with pytest.raises(ProtocolError):
+        decode_request_body(body[:len('http://a/') + 3], count)
+
+@pytest.mark.parametrize('cut', [1, 5])
+def test_body_length_mismatch_is_protocol_error(cut):
+    _, _, count, body = split_frame(encode_request(1, ['http://a/']))
+    with pytest.raises(ProtocolError):
+        decode_request_body(body[:-cut], count)
+    with pytest.raises(ProtocolError):
+        decode_request_body(body + b'x', count)
+    _, _, count, body = split_frame(encode_response(1, [(0.5, False)]))
+    with pytest.raises(ProtocolError):
+        decode_response_body(body[:-cut], count)
+
+def test_read_frame():
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_request(1, ['http://a/']) + encode_response(2, [(0.5, True)]))
+        reader.feed_eof()
+        first = await read_frame(reader)
+        second = await read_frame(reader)
+        end = await read_frame(reader)
+
+        partial = asyncio.StreamReader()
+        partial.feed_data(encode_request(3, ['http://a/'])[:HEADER.size - 1])
+        partial.feed_eof()
+        with pytest.raises(ProtocolError):
+            await read_frame(partial)
+
+        # 헤더는 다 왔지만 본문 도중에 연결이 끊긴 경우
+        short_body = asyncio.StreamReader()
+        short_body.feed_data(encode_request(4, ['http://a/'])[:HEADER.size + 3])
+        short_body.feed_eof()
+        with pytest.raises(ProtocolError):
+            await read_frame(short_body)
+        return first, second, end
+
+    first, second, end = asyncio.run(scenario())
+    assert first[:3] == (1, STATUS_OK, 1)
+    assert decode_request_body(first[3], first[2]) == ['http://a/']
+    assert second[:3] == (2, STATUS_OK, 1)
+    assert end is None
+
+def fake_verdict(url):
+    probability = 0.9 if 'evil' in url else 0.1
+    return {'url': url, 'probability': probability, 'is_malicious': probability > 0.5}
+
+@pytest.fixture
+def service(monkeypatch):
+    """추론 풀 대신 URL 에 따라 바로 결과를 돌려주는 분류 서비스 (바이너리 연결 처리만 사용)"""
+    import classifier_service
+
+    monkeypatch.setattr(classifier_service, 'MAX_BATCH_SIZE', 8)
+    instance = classifier_service.ClassifierService()
+
+    async def classify(urls, with_features=False):
+        await asyncio.sleep(0)
+        return [fake_verdict(url) for url in urls]
+
+    instance.classify = classify
+    return instance
+
+def run_with_server(service, tmp_path, scenario):
+    address = os.path.join(str(tmp_path), 'classifier.sock')
+
+    async def main():
+        server = await asyncio.start_unix_server(service.handle_binary_connection, address)
+        try:
+            return await scenario('unix:' + address)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+def test_async_client_pipelines_requests(service, tmp_path):
+    async def scenario(address):
+        client = AsyncClassifierClient(address, timeout=2.0)
+        try:
+            return await asyncio.gather(
+                client.classify(['http://evil.example/', 'http://good.example/']),
+                client.classify(['http://good.example/a']),
+                client.classify([])
+            )
+        finally:
+            await client.close()
+
+    first, second, empty = run_with_server(service, tmp_path, scenario)
+    assert first == [(True, 0.9), (False, 0.1)]
+    assert second == [(False, 0.1)]
+    assert empty == []
+
+def test_sync_client(service, tmp_path):
+    async def scenario(address):
+        client = ClassifierClient(address, timeout=2.0)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, client.classify, ['http://evil.example/x'])
+        finally:
+            client.close()
+
+    assert run_with_server(service, tmp_path, scenario) == [(True, 0.9)]
+
+def test_oversized_frame_is_rejected(service, tmp_path):
+    async def scenario(address):
+        client = AsyncClassifierClient(address, timeout=2.0)
+        try:
+            rejected = await client.classify(['http://good.example/'] * 9)
+            # 거절한 뒤에도 같은 연결로 계속 요청할 수 있음
+            accepted = await client.classify(['http://good.example/'] * 8)
+            return rejected, accepted
+        finally:
+            await client.close()
+
+    rejected, accepted = run_with_server(service, tmp_path, scenario)
+    assert rejected is None
+    assert accepted == [(False, 0.1)] * 8
+
+def test_truncated_frame_closes_connection(service, tmp_path):
+    async def scenario(address):
+        reader, writer = await classifier_protocol.open_connection(address)
+        body = encode_request(1, ['http://a/'])[HEADER.size:]
+        writer.write(HEADER.pack(3, 1, STATUS_OK, 2) + body[:3])
+        frame = await asyncio.wait_for(read_frame(reader), 2.0)
+        writer.close()
+        return frame
+
+    assert run_with_server(service, tmp_path, scenario) is None
+
+def test_disconnect_in_body_is_handled(service, tmp_path, caplog):
+    async def scenario(address):
+        reader, writer = await classifier_protocol.open_connection(address)
+        frame = encode_request(1, ['http://a/'])
+        # 본문 11 바이트 중 3 바이트만 보내고 연결 종료
+        writer.write(frame[:HEADER.size + 3])
+        writer.write_eof()
+        result = await asyncio.wait_for(read_frame(reader), 2.0)
+        writer.close()
+        # 서버 쪽 연결 처리 작업이 끝날 때까지 한 번 더 양보
+        await asyncio.sleep(0.05)
+        return result
+
+    assert run_with_server(service, tmp_path, scenario) is None
+    assert 'Unhandled exception in client_connected_cb' not in caplog.text
+    assert '프레임 본문을 읽는 중 연결이 끊겼습니다.' in caplog.text
+
+def test_async_client_timeout_releases_request(tmp_path):
+    address = os.path.join(str(tmp_path), 'silent.sock')
+
+    async def silent(reader, writer):
+        # 요청을 읽기만 하고 응답하지 않음
+        await reader.read()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_unix_server(silent, address)
+        client = AsyncClassifierClient('unix:' + address, timeout=0.1)
+        try:
+            result = await client.classify(['http://a/'])
+            return result, dict(client._pending)
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    result, pending = asyncio.run(main())
+    assert result is None
+    assert pending == {}
+
+def test_old_connection_cleanup_keeps_new_connection(tmp_path):
+    address = os.path.join(str(tmp_path), 'reconnect.sock')
+    connections = []
+    state = {}
+
+    async def handler(reader, writer):
+        index = len(connections)
+        connections.append(writer)
+        while True:
+            frame = await read_frame(reader)
+            if frame is None:
+                break
+            request_id, _, count, body = frame
+            if index == 1:
+                # 새 연결의 응답은 이전 연결이 정리된 뒤에 보냄
+                state['received'].set()
+                await state['release'].wait()
+            writer.write(encode_response(request_id, [(0.1, False)] * count))
+        writer.close()
+
+    async def main():
+        state['received'] = asyncio.Event()
+        state['release'] = asyncio.Event()
+        server = await asyncio.start_unix_server(handler, address)
+        client = AsyncClassifierClient('unix:' + address, timeout=2.0)
+        try:
+            assert await client.classify(['http://a/']) == [(False, 0.1)]
+
+            # 쓰기 오류 등으로 이전 연결이 닫히는 중인 상태
+            old_writer = client._writer
+            old_writer.is_closing = lambda: True
+
+            task = asyncio.ensure_future(client.classify(['http://b/']))
+            await asyncio.wait_for(state['received'].wait(), 2.0)
+            new_writer = client._writer
+            assert new_writer is not old_writer
+
+            # 이전 연결이 끊겨 이전 읽기 작업이 끝나도 새 연결의 요청은 그대로 유지
+            connections[0].close()
+            await asyncio.sleep(0.1)
+            state['release'].set()
+            result = await task
+            return result, client._writer is new_writer
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    result, same_writer = asyncio.run(main())
+    assert result == [(False, 0.1)]
+    assert same_writer
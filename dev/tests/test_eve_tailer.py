@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+from eve_tailer import EveTailer
+
+def http_line(url, **extra):
+    event = {'event_type': 'http', 'http': {'hostname': 'example.com', 'url': url}}
+    event.update(extra)
+    return json.dumps(event, separators=(',', ':')) + '\n'
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+def urls(events):
+    return [event['http']['url'] for event in events]
+
+@pytest.fixture
+def eve_path(tmp_path):
+    path = str(tmp_path / 'eve.json')
+    open(path, 'w').close()
+    return path
+
+def test_reads_only_target_events(eve_path):
+    tailer = EveTailer(eve_path, start_at_end=False)
+    append(eve_path, http_line('/a')
+           + '{"event_type":"dns","dns":{}}\n'
+           + '{"event_type": "http", "http": {"url": "/spaced"}}\n'
+           + '{"event_type":"http", broken\n'
+           + '{"event_type":"alert","http":{"url":"/alert"}}\n'
+           + http_line('/b'))
+    assert urls(tailer.read_events()) == ['/a', '/spaced', '/b']
+    assert tailer.offset == os.path.getsize(eve_path)
+
+def test_partial_line_waits_for_newline(eve_path):
+    tailer = EveTailer(eve_path, start_at_end=False, chunk_size=16)
+    line = http_line('/partial')
+    append(eve_path, http_line('/first') + line[:10])
+    assert urls(tailer.read_events()) == ['/first']
+    assert tailer.offset == len(http_line('/first'))
+
+    append(eve_path, line[10:])
+    assert urls(tailer.read_events()) == ['/partial']
+    assert tailer.offset == os.path.getsize(eve_path)
+
+def test_start_at_end_and_resume_position(eve_path):
+    append(eve_path, http_line('/old'))
+    tailer = EveTailer(eve_path)
+    tailer.open()
+    append(eve_path, http_line('/new'))
+    assert urls(tailer.read_events()) == ['/new']
+
+    resumed = EveTailer(eve_path)
+    resumed.open(position=len(http_line('/old')))
+    assert urls(resumed.read_events()) == ['/new']
+
+    # 파일보다 뒤의 위치는 다른 파일의 기록이므로 처음부터 읽음
+    stale = EveTailer(eve_path)
+    stale.open(position=os.path.getsize(eve_path) + 100)
+    assert urls(stale.read_events()) == ['/old', '/new']
+
+def test_rotation_reads_rest_of_old_file_then_new_file(eve_path):
+    tailer = EveTailer(eve_path, start_at_end=False)
+    append(eve_path, http_line('/1'))
+    assert urls(tailer.read_events()) == ['/1']
+    old_inode = tailer.inode
+
+    # 회전 직전에 이전 파일에 마지막으로 기록된 이벤트도 놓치지 않아야 함
+    append(eve_path, http_line('/2'))
+    os.rename(eve_path, eve_path + '.1')
+    append(eve_path + '.1', http_line('/3'))
+    append(eve_path, http_line('/4'))
+
+    assert urls(tailer.read_events()) == ['/2', '/3', '/4']
+    assert tailer.inode != old_inode
+    assert tailer.offset == os.path.getsize(eve_path)
+
+def test_rotation_before_new_file_exists(eve_path):
+    tailer = EveTailer(eve_path, start_at_end=False)
+    tailer.open()
+    append(eve_path, http_line('/1'))
+    os.rename(eve_path, eve_path + '.1')
+    assert urls(tailer.read_events()) == ['/1']
+    assert urls(tailer.read_events()) == []
+
+    append(eve_path, http_line('/2'))
+    assert urls(tailer.read_events()) == ['/2']
+
+def test_truncation_restarts_from_beginning(eve_path):
+    tailer = EveTailer(eve_path, start_at_end=False)
+    append(eve_path, http_line('/before-1') + http_line('/before-2'))
+    assert urls(tailer.read_events()) == ['/before-1', '/before-2']
+
+    with open(eve_path, 'w') as f:
+        f.write(http_line('/after'))
+    assert urls(tailer.read_events()) == ['/after']
+    assert tailer.offset == os.path.getsize(eve_path)
+
+def test_missing_file_is_opened_when_created(tmp_path):
+    path = str(tmp_path / 'eve.json')
+    tailer = EveTailer(path)
+    assert tailer.open() is False
+    assert list(tailer.read_events()) == []
+
+    append(path, http_line('/created'))
+    # 나중에 생긴 파일은 처음부터 읽지 않고 열린 시점의 끝부터 읽음
+    assert list(tailer.read_events()) == []
+    append(path, http_line('/next'))
+    assert urls(tailer.read_events()) == ['/next']
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from metrics import Registry, SharedMetrics, _format_value, remove_stale_snapshots, render_snapshots
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+@pytest.mark.parametrize('value, text', [
+    (3, '3'), (True, '1'), (2.0, '2'), (0.25, '0.25'),
+    (float('nan'), 'NaN'), (float('inf'), '+Inf'), (float('-inf'), '-Inf'),
+])
+def test_format_value(value, text):
+    assert _format_value(value) == text
+
+def make_registry(requests, in_flight, ratio):
+    registry = Registry()
+    registry.counter('requests_total', '요청 수', ('outcome',)).inc(requests, outcome='allowed')
+    registry.gauge('in_flight', '처리 중인 요청 수').set(in_flight)
+    registry.gauge('hit_ratio', '적중률', multiprocess_mode='all').set(ratio)
+    registry.gauge('limit', '최대 연결 수', multiprocess_mode='max').set(in_flight * 10)
+    registry.histogram('seconds', '처리 시간', buckets=(0.1, 1.0)).observe(requests / 10.0)
+    return registry
+
+def test_render_snapshots_merges_processes():
+    text = render_snapshots([
+        (101, True, make_registry(1, 2, 0.5).snapshot()),
+        (102, True, make_registry(3, 4, 0.25).snapshot()),
+        # 종료된 작업자: 카운터 / 히스토그램만 합계에 포함
+        (103, False, make_registry(5, 100, 1.0).snapshot()),
+    ])
+    lines = text.splitlines()
+    assert 'requests_total{outcome="allowed"} 9' in lines
+    assert 'in_flight 6' in lines
+    assert 'limit 40' in lines
+    assert 'hit_ratio{pid="101"} 0.5' in lines
+    assert 'hit_ratio{pid="102"} 0.25' in lines
+    assert not any(line.startswith('hit_ratio{pid="103"}') for line in lines)
+    assert 'seconds_bucket{le="0.1"} 1' in lines
+    assert 'seconds_bucket{le="1"} 3' in lines
+    assert 'seconds_bucket{le="+Inf"} 3' in lines
+    assert 'seconds_count 3' in lines
+    assert lines.count('# TYPE requests_total counter') == 1
+
+def test_shared_metrics_reads_other_workers(tmp_path):
+    path = str(tmp_path / 'metrics')
+    registry = make_registry(1, 2, 0.5)
+    shared = SharedMetrics(registry, path, interval=60.0)
+    # start() 전에는 현재 프로세스의 값만 출력
+    assert shared.render() == registry.render()
+
+    shared.start()
+    try:
+        stale = os.path.join(path, f'{dead_pid()}-0000.json')
+        with open(stale, 'w') as f:
+            json.dump(make_registry(5, 100, 1.0).snapshot(), f)
+
+        lines = shared.render().splitlines()
+        assert 'requests_total{outcome="allowed"} 6' in lines
+        assert 'in_flight 2' in lines
+
+        remove_stale_snapshots(path)
+        assert not os.path.exists(stale)
+        assert os.path.exists(shared.file_path)
+    finally:
+        shared.stop()
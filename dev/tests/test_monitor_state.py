@@ -0,0 +1,91 @@
+import time
+
+from monitor_state import OffsetCheckpoint, OffsetTracker, VerdictStore
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = OffsetCheckpoint(str(tmp_path / 'eve_checkpoint.json'))
+    assert checkpoint.load() is None
+    checkpoint.save(42, 1234)
+    assert checkpoint.load() == (42, 1234)
+
+    (tmp_path / 'eve_checkpoint.json').write_text('{broken')
+    assert checkpoint.load() is None
+
+def test_tracker_commits_only_contiguous_finished_events():
+    tracker = OffsetTracker()
+    assert tracker.committed() is None
+
+    tracker.advance(1, 100)
+    first = tracker.add(1, 150)
+    second = tracker.add(1, 200)
+    third = tracker.add(1, 250)
+    # 아무것도 끝나지 않았으면 첫 이벤트 앞 (처음 연 위치)
+    assert tracker.committed() == (1, 100)
+
+    # 뒤의 이벤트가 먼저 끝나도 앞 이벤트가 끝나기 전에는 넘어가지 않음
+    tracker.done(third)
+    tracker.done(second)
+    assert tracker.committed() == (1, 100)
+    assert tracker.pending() == 3
+
+    tracker.done(first)
+    assert tracker.committed() == (1, 250)
+    assert tracker.pending() == 0
+
+def test_tracker_includes_skipped_lines_when_idle():
+    tracker = OffsetTracker()
+    entry = tracker.add(1, 50)
+    # 대상이 아닌 줄을 더 읽었어도 처리 중인 이벤트가 있으면 그 앞에서 멈춤
+    tracker.advance(1, 400)
+    assert tracker.committed() is None
+    tracker.done(entry)
+    assert tracker.committed() == (1, 400)
+
+    later = tracker.add(1, 450)
+    assert tracker.committed() == (1, 400)
+    tracker.done(later)
+    tracker.done(later)
+    assert tracker.committed() == (1, 450)
+
+def test_tracker_across_rotation():
+    tracker = OffsetTracker()
+    tracker.advance(1, 0)
+    old = tracker.add(1, 300)
+    new = tracker.add(2, 80)
+    tracker.done(new)
+    # 이전 파일의 이벤트가 남아 있으면 이전 파일 기준 위치
+    assert tracker.committed() == (1, 0)
+    tracker.done(old)
+    assert tracker.committed() == (2, 80)
+
+def test_load_recent_keeps_benign_verdicts(tmp_path):
+    store = VerdictStore(str(tmp_path / 'verdicts.sqlite3'), benign_ttl=300.0, malicious_ttl=7 * 24 * 3600.0)
+    try:
+        store.put_many([(f'http://benign/{i}', False, 0.1) for i in range(5)])
+        store.put_many([(f'http://malicious/{i}', True, 0.9) for i in range(5)])
+
+        rows = store.load_recent(3, 2)
+        benign = [url for url, is_malicious, _ in rows if not is_malicious]
+        malicious = [url for url, is_malicious, _ in rows if is_malicious]
+        assert len(benign) == 3
+        assert len(malicious) == 2
+        for url, is_malicious, remaining in rows:
+            assert 0 < remaining <= (7 * 24 * 3600.0 if is_malicious else 300.0)
+    finally:
+        store.close()
+
+def test_load_recent_prefers_latest_and_skips_expired(tmp_path, monkeypatch):
+    store = VerdictStore(str(tmp_path / 'verdicts.sqlite3'), benign_ttl=300.0)
+    try:
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now - 1000)
+        store.put_many([('http://expired/', False, 0.1)])
+        monkeypatch.setattr(time, 'time', lambda: now - 10)
+        store.put_many([('http://older/', False, 0.1)])
+        monkeypatch.setattr(time, 'time', lambda: now)
+        store.put_many([('http://newer/', False, 0.1)])
+
+        assert [url for url, _, _ in store.load_recent(1, 1)] == ['http://newer/']
+        assert [url for url, _, _ in store.load_recent(10, 10)] == ['http://newer/', 'http://older/']
+    finally:
+        store.close()
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from proxy_server import URLCheckCoalescer, VerdictCache
+
+def verdict(url):
+    return ('evil' in url, 0.9 if 'evil' in url else 0.1)
+
+class FakeClassifier:
+    """호출마다 받은 URL 목록을 기록하는 일괄 분류 함수"""
+
+    def __init__(self, result=None, delay=0.0):
+        self.calls = []
+        self.result = result
+        self.delay = delay
+
+    async def __call__(self, urls):
+        self.calls.append(list(urls))
+        await asyncio.sleep(self.delay)
+        if self.result is not None:
+            return self.result(urls)
+        return [verdict(url) for url in urls]
+
+def test_coalescer_batches_and_deduplicates():
+    classifier = FakeClassifier()
+
+    async def scenario():
+        coalescer = URLCheckCoalescer(classifier, window=0.01, max_batch=64)
+        return await asyncio.gather(*(coalescer.check(url) for url in
+                                      ['http://a/', 'http://evil/', 'http://a/', 'http://b/']))
+
+    results = asyncio.run(scenario())
+    assert results == [(False, 0.1), (True, 0.9), (False, 0.1), (False, 0.1)]
+    assert classifier.calls == [['http://a/', 'http://evil/', 'http://b/']]
+
+def test_coalescer_flushes_when_batch_is_full():
+    classifier = FakeClassifier()
+
+    async def scenario():
+        # 창이 길어도 max_batch 에 도달하면 바로 분류
+        coalescer = URLCheckCoalescer(classifier, window=10.0, max_batch=3)
+        urls = [f'http://u{i}/' for i in range(7)]
+        results = await asyncio.wait_for(
+            asyncio.gather(*(coalescer.check(url) for url in urls[:6])), 1.0)
+        # 남은 하나는 창이 지나야 분류되므로 직접 비움
+        last = asyncio.ensure_future(coalescer.check(urls[6]))
+        await asyncio.sleep(0)
+        coalescer.flush()
+        return results + [await last]
+
+    results = asyncio.run(scenario())
+    assert results == [(False, 0.1)] * 7
+    assert [len(call) for call in classifier.calls] == [3, 3, 1]
+
+@pytest.mark.parametrize('result', [
+    lambda urls: None,
+    lambda urls: [(False, 0.1)],
+    lambda urls: 1 / 0,
+])
+def test_coalescer_failures_resolve_to_none(result):
+    classifier = FakeClassifier(result=result)
+
+    async def scenario():
+        coalescer = URLCheckCoalescer(classifier, window=0.001)
+        return await asyncio.gather(coalescer.check('http://a/'), coalescer.check('http://b/'))
+
+    assert asyncio.run(scenario()) == [None, None]
+
+def test_coalescer_cancelled_waiter_does_not_cancel_others():
+    classifier = FakeClassifier(delay=0.05)
+
+    async def scenario():
+        coalescer = URLCheckCoalescer(classifier, window=0.001)
+        first = asyncio.ensure_future(coalescer.check('http://a/'))
+        second = asyncio.ensure_future(coalescer.check('http://a/'))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ((False, 0.1), True)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, 'monotonic', fake)
+    return fake
+
+def test_cache_ttl_depends_on_verdict(clock):
+    cache = VerdictCache(max_entries=10, benign_ttl=10.0, malicious_ttl=100.0)
+    cache.put('benign', False, 0.1)
+    cache.put('malicious', True, 0.9)
+    assert cache.get('benign') == (False, 0.1)
+
+    clock.now += 50
+    assert cache.get('benign') is None
+    assert cache.get('malicious') == (True, 0.9)
+
+    clock.now += 50
+    assert cache.get('malicious') is None
+    assert len(cache) == 0
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 2
+
+def test_cache_evicts_least_recently_used(clock):
+    cache = VerdictCache(max_entries=2)
+    cache.put('a', False, 0.1)
+    cache.put('b', False, 0.2)
+    # 조회한 항목은 최근 사용으로 옮겨져 남음
+    assert cache.get('a') == (False, 0.1)
+    cache.put('c', True, 0.9)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == (False, 0.1)
+    assert cache.get('c') == (True, 0.9)
+    assert cache.stats()['evictions'] == 1
+
+def test_cache_disabled_by_zero_ttl_or_size(clock):
+    no_benign = VerdictCache(benign_ttl=0)
+    no_benign.put('a', False, 0.1)
+    no_benign.put('b', True, 0.9)
+    assert no_benign.get('a') is None
+    assert no_benign.get('b') == (True, 0.9)
+
+    disabled = VerdictCache(max_entries=0)
+    disabled.put('a', True, 0.9)
+    assert len(disabled) == 0
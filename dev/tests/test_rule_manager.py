@@ -0,0 +1,31 @@
+from rule_manager import RULE_TEMPLATE, SuricataRuleManager
+
+def test_block_domain_writes_rule_once(tmp_path):
+    rules_path = str(tmp_path / 'malicious_urls.rules')
+    manager = SuricataRuleManager(rules_path, pid_file=str(tmp_path / 'missing.pid'))
+    manager.load()
+    assert manager.block_domain('Evil.Example.') is True
+    assert manager.block_domain('evil.example') is False
+    assert manager.block_domain('bad"domain') is False
+    assert manager.flush() is True
+    assert manager.flush() is False
+
+    reloaded = SuricataRuleManager(rules_path)
+    reloaded.load()
+    assert reloaded.has_domain('evil.example')
+    assert reloaded.sid_for('evil.example') == manager.sid_for('evil.example')
+
+def test_sid_skips_preserved_rules(tmp_path):
+    rules_path = tmp_path / 'malicious_urls.rules'
+    manager = SuricataRuleManager(str(rules_path), sid_range=4)
+    taken = manager.sid_for('evil.example')
+    following = manager.sid_base + (taken - manager.sid_base + 1) % 4
+    # 이 관리자가 만들지 않은 규칙과 주석 처리된 규칙이 같은 sid 를 쓰고 있음
+    rules_path.write_text(f'alert tcp any any -> any 4444 (msg:"custom"; sid:{taken}; rev:1;)\n'
+                          f'# {RULE_TEMPLATE.format(domain="old.example", sid=following)}\n')
+    manager.load()
+    assert manager.reserved_sids == {taken, following}
+
+    sid = manager.sid_for('evil.example')
+    assert sid not in (taken, following)
+    assert manager.sid_base <= sid < manager.sid_base + 4
@@ -0,0 +1,46 @@
+import numpy as np
+
+from benchmark import EDGE_CASE_URLS, check_feature_parity, generate_urls, legacy_extract_url_features
+from url_features import REQUIRED_FEATURES, build_feature_matrix, extract_url_features
+
+# 고정 URL 목록 (경계 사례 + 재현 가능한 생성 URL + 실제 형태의 URL)
+CORPUS = EDGE_CASE_URLS + generate_urls(2000, seed=0) + [
+    '',
+    'http://example.com',
+    'https://www.google.com/search?q=python+url&hl=ko',
+    'http://192.168.0.1/admin/login.php',
+    'https://accounts.secure-update.online/signin/LOGIN?session=8f3a9c',
+    'http://xn--80ak6aa92e.xn--p1ai/',
+    'http://a.b.c.d.e.f.example.info/path/to/file.exe',
+    'https://example.com:8443/%2e%2e/%2F?x=%00',
+    'http://例え.テスト/パス?キー=値',
+    'http://[2001:db8::1]:8080/Index.HTML',
+    'http://example.com/' + 'a' * 5000,
+]
+
+def test_features_match_legacy_implementation():
+    mismatches = check_feature_parity(CORPUS)
+    assert mismatches == [], mismatches[:3]
+
+def test_feature_names_and_types():
+    features = extract_url_features('https://sub.login.example.xyz/LOGIN?id=123')
+    assert sorted(features) == sorted(REQUIRED_FEATURES)
+    assert features['suspicious_tld'] == 1
+    assert features['has_login'] == 1
+    assert features['subdomain_count'] == 2
+
+def test_invalid_url_falls_back_to_defaults():
+    features = extract_url_features('http://[::1')
+    assert features == legacy_extract_url_features('http://[::1')
+    assert features['url_length'] == len('http://[::1')
+    assert features['url_entropy'] == 0
+
+def test_feature_matrix_column_order():
+    urls = CORPUS[:50]
+    matrix = build_feature_matrix(urls)
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (len(urls), len(REQUIRED_FEATURES))
+    for row, url in zip(matrix, urls):
+        expected = legacy_extract_url_features(url)
+        np.testing.assert_array_equal(row, np.array([expected[name] for name in REQUIRED_FEATURES],
+                                                    dtype=np.float32))
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import os
 import sys
+import glob
+import gzip
 import subprocess
 import json
 import time
@@ -67,26 +69,41 @@ class URLBlockerManager:
         for dir_path in dirs:
             os.makedirs(dir_path, exist_ok=True)
     
+    def is_running(self, process):
+        """명령줄에 process 가 들어간 프로세스가 실행 중인지 확인"""
+        result = subprocess.run(['pgrep', '-f', process], capture_output=True)
+        return result.returncode == 0
+    
     def start_services(self):
-        """모든 서비스 시작"""
+        """모든 서비스 시작 (start.sh 등에서 이미 띄운 서비스는 다시 시작하지 않음)"""
         logger.info("URL Blocker 서비스 시작")
         
-        # Flask 서버 시작
-        flask_cmd = f"python3 app.py > {self.config['flask_server']['log_file']} 2>&1 &"
-        subprocess.Popen(flask_cmd, shell=True)
-        logger.info("Flask 서버 시작됨")
-        
-        time.sleep(2)  # Flask 서버 시작 대기
+        # Flask 서버 시작 (gunicorn 다중 작업자)
+        # 같은 포트에 gunicorn 을 두 번 띄우면 준비 표시 파일 디렉토리도 공유하게 되므로 중복 실행하지 않음
+        if self.is_running('app:app'):
+            logger.info("Flask 서버가 이미 실행 중")
+        else:
+            flask_cmd = f"gunicorn -c gunicorn.conf.py app:app > {self.config['flask_server']['log_file']} 2>&1 &"
+            subprocess.Popen(flask_cmd, shell=True)
+            logger.info("Flask 서버 시작됨")
+            
+            time.sleep(2)  # Flask 서버 시작 대기
         
         # 프록시 서버 시작
-        proxy_cmd = f"python3 proxy_server.py --host {self.config['proxy_server']['host']} --port {self.config['proxy_server']['port']} > {self.config['proxy_server']['log_file']} 2>&1 &"
-        subprocess.Popen(proxy_cmd, shell=True)
-        logger.info("프록시 서버 시작됨")
+        if self.is_running('proxy_server.py'):
+            logger.info("프록시 서버가 이미 실행 중")
+        else:
+            proxy_cmd = f"python3 proxy_server.py --host {self.config['proxy_server']['host']} --port {self.config['proxy_server']['port']} > {self.config['proxy_server']['log_file']} 2>&1 &"
+            subprocess.Popen(proxy_cmd, shell=True)
+            logger.info("프록시 서버 시작됨")
         
         # Suricata 모니터 시작
-        monitor_cmd = "python3 suricata_monitor.py > /var/log/url_blocker/suricata_monitor.log 2>&1 &"
-        subprocess.Popen(monitor_cmd, shell=True)
-        logger.info("Suricata 모니터 시작됨")
+        if self.is_running('suricata_monitor.py'):
+            logger.info("Suricata 모니터가 이미 실행 중")
+        else:
+            monitor_cmd = "python3 suricata_monitor.py > /var/log/url_blocker/suricata_monitor.log 2>&1 &"
+            subprocess.Popen(monitor_cmd, shell=True)
+            logger.info("Suricata 모니터 시작됨")
         
         logger.info("모든 서비스가 시작되었습니다.")
     
@@ -95,7 +112,7 @@ class URLBlockerManager:
         logger.info("URL Blocker 서비스 중지")
         
         # Python 프로세스 종료
-        processes = ['app.py', 'proxy_server.py', 'suricata_monitor.py']
+        processes = ['app:app', 'proxy_server.py', 'suricata_monitor.py']
         for process in processes:
             try:
                 subprocess.run(['pkill', '-f', process], check=True)
@@ -117,7 +134,7 @@ class URLBlockerManager:
         
         # 프로세스 상태 확인
         processes = {
-            'Flask 서버': 'app.py',
+            'Flask 서버': 'app:app',
             '프록시 서버': 'proxy_server.py',
             'Suricata 모니터': 'suricata_monitor.py'
         }
@@ -143,19 +160,27 @@ class URLBlockerManager:
         """차단 통계 표시"""
         print("\n=== 차단 통계 ===")
         
+        # 프록시를 --workers 로 실행하면 작업자별 파일 (blocked_urls.worker0.log 등) 에 기록되고,
+        # 크기 / 날짜로 회전된 파일 (blocked_urls.log.20240101-000000[.gz] 등) 도 함께 집계
         blocked_log = self.config['blocked_urls_log']
-        if not os.path.exists(blocked_log):
+        root, ext = os.path.splitext(blocked_log)
+        patterns = [blocked_log, f"{blocked_log}.*", f"{root}.worker*{ext}", f"{root}.worker*{ext}.*"]
+        blocked_logs = sorted({path for pattern in patterns for path in glob.glob(pattern)
+                               if os.path.isfile(path)})
+        if not blocked_logs:
             print("차단된 URL이 없습니다.")
             return
         
         blocked_urls = []
-        with open(blocked_log, 'r') as f:
-            for line in f:
-                try:
-                    entry = json.loads(line.strip())
-                    blocked_urls.append(entry)
-                except:
-                    continue
+        for path in blocked_logs:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line.strip())
+                        blocked_urls.append(entry)
+                    except:
+                        continue
         
         if not blocked_urls:
             print("차단된 URL이 없습니다.")
@@ -0,0 +1,141 @@
+import logging
+import math
+import string
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+logger = logging.getLogger('url_classifier')
+
+# 특성 이름 (오류 시 기본값을 채우는 순서)
+FEATURE_NAMES = [
+    'url_length', 'path_depth', 'num_special_chars', 'special_chars_ratio',
+    'num_digits', 'digits_ratio', 'num_uppercase', 'uppercase_ratio',
+    'subdomain_count', 'url_entropy', 'hyphen_count', 'suspicious_tld', 'has_login'
+]
+
+# 모델 입력 특성 순서
+REQUIRED_FEATURES = [
+    'url_entropy', 'num_special_chars', 'url_length', 'path_depth', 
+    'digits_ratio', 'num_digits', 'subdomain_count', 'special_chars_ratio',
+    'hyphen_count', 'suspicious_tld', 'num_uppercase', 'uppercase_ratio', 
+    'has_login'
+]
+
+# 악성 판정 임계값
+THRESHOLD = 0.5
+
+# 의심스러운 최상위 도메인
+SUSPICIOUS_TLDS = frozenset(['xyz', 'top', 'club', 'online', 'site', 'info', 'biz', 'cn', 'ru', 'tk'])
+
+# ASCII URL 용 문자 분류 테이블 (bytes.translate 로 삭제한 뒤 줄어든 길이가 해당 문자 수)
+_PUNCT_BYTES = string.punctuation.encode('ascii')
+_DIGIT_BYTES = string.digits.encode('ascii')
+_UPPER_BYTES = string.ascii_uppercase.encode('ascii')
+
+_LOG2 = math.log2
+
+# 'login' 포함 여부를 lower() 없이 먼저 배제하기 위한 문자 쌍
+_LOGIN_LETTERS = (('l', 'L'), ('o', 'O'), ('g', 'G'), ('i', 'I'), ('n', 'N'))
+
+def _count_char_classes(url, counts):
+    """특수문자 / 숫자 / 대문자 수 계산"""
+    if url.isascii():
+        data = url.encode('ascii')
+        length = len(data)
+        return (length - len(data.translate(None, _PUNCT_BYTES)),
+                length - len(data.translate(None, _DIGIT_BYTES)),
+                length - len(data.translate(None, _UPPER_BYTES)))
+    
+    # 유니코드 숫자 / 대문자가 있을 수 있으므로 서로 다른 문자 단위로 판정
+    num_special = num_digits = num_upper = 0
+    for c, count in counts.items():
+        if c in string.punctuation:
+            num_special += count
+        if c.isdigit():
+            num_digits += count
+        if c.isupper():
+            num_upper += count
+    return num_special, num_digits, num_upper
+
+def _default_features(features):
+    for key in FEATURE_NAMES:
+        if key not in features:
+            features[key] = 0
+    return features
+
+# URL 특성 추출 함수
+def extract_url_features(url):
+    """문자 빈도표 하나와 바이트 분류 테이블로 13개 특성을 계산 (기존 구현과 같은 값)"""
+    features = {}
+
+    # URL 길이
+    length = len(url)
+    features['url_length'] = length
+
+    try:
+        parsed_url = urlsplit(url)
+    except Exception as e:
+        logger.error(f"특성 추출 중 오류: {e}")
+        return _default_features(features)
+
+    try:
+        # 문자 빈도표 (엔트로피와 경로 깊이 / 하이픈 수 계산에 공유)
+        counts = Counter(url)
+        num_special, num_digits, num_upper = _count_char_classes(url, counts)
+        
+        denominator = max(length, 1)
+
+        # 경로 깊이
+        features['path_depth'] = counts.get('/', 0)
+
+        # 특수문자 수 / 비율
+        features['num_special_chars'] = num_special
+        features['special_chars_ratio'] = num_special / denominator
+
+        # 숫자 수 / 비율
+        features['num_digits'] = num_digits
+        features['digits_ratio'] = num_digits / denominator
+
+        # 대문자 수 / 비율
+        features['num_uppercase'] = num_upper
+        features['uppercase_ratio'] = num_upper / denominator
+
+        # 서브도메인 수 (netloc 의 마지막 두 레이블을 제외한 레이블 수)
+        netloc = parsed_url.netloc
+        features['subdomain_count'] = max(netloc.count('.') - 1, 0)
+
+        # URL Shannon 엔트로피
+        if length > 1:
+            features['url_entropy'] = -sum([(count / length) * _LOG2(count / length) for count in counts.values()])
+        else:
+            features['url_entropy'] = 0
+
+        # 하이픈 수
+        features['hyphen_count'] = counts.get('-', 0)
+
+        # suspicious_tld (의심스러운 최상위 도메인)
+        tld = netloc.rsplit('.', 1)[-1] if '.' in netloc else ''
+        features['suspicious_tld'] = 1 if tld.lower() in SUSPICIOUS_TLDS else 0
+
+        # login 키워드 포함 여부 (구성 문자가 모두 있을 때만 소문자 변환)
+        has_letters = all(counts.get(lower) or counts.get(upper) for lower, upper in _LOGIN_LETTERS)
+        features['has_login'] = 1 if has_letters and 'login' in url.lower() else 0
+
+    except Exception as e:
+        logger.error(f"특성 추출 중 오류: {e}")
+        _default_features(features)
+
+    return features
+
+def features_to_matrix(feature_dicts):
+    """특성 딕셔너리 목록을 모델 입력 순서의 float32 행렬로 변환 (누락된 특성은 0)"""
+    matrix = np.empty((len(feature_dicts), len(REQUIRED_FEATURES)), dtype=np.float32)
+    for row, features in enumerate(feature_dicts):
+        matrix[row] = [features.get(name, 0) for name in REQUIRED_FEATURES]
+    return matrix
+
+def build_feature_matrix(urls):
+    """URL 목록을 바로 모델 입력 행렬로 변환"""
+    return features_to_matrix([extract_url_features(url) for url in urls])
@@ -0,0 +1,153 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+logger = logging.getLogger('worker_supervisor')
+
+class WorkerSupervisor:
+    """작업자 프로세스 N개를 fork 하여 실행하고 감시하는 관리자 (proxy_server --workers 용)
+
+    target(index) 는 fork 된 자식 프로세스에서 호출되고, 반환하면 자식은 종료 코드 0 으로 끝난다.
+    작업자가 종료되면 같은 번호로 다시 시작하되, 시작 직후 바로 종료하기를 반복하면 재시작
+    간격을 두 배씩 늘린다. SIGTERM / SIGINT 를 받으면 모든 작업자에 SIGTERM 을 보내 처리 중인
+    요청을 마치게 하고, drain_timeout 이 지나도 남은 작업자는 SIGKILL 로 종료한다.
+    """
+
+    def __init__(self, target, workers, drain_timeout=60.0, restart_delay=1.0, max_restart_delay=30.0,
+                 min_uptime=10.0):
+        self.target = target
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.min_uptime = min_uptime
+
+        self.pids = {}
+        self.restarts = 0
+        self._started_at = {}
+        self._delays = {}
+        self._pending = {}
+        self._stopping = False
+
+    def spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            self._run_child(index)
+        self.pids[pid] = index
+        self._started_at[index] = time.monotonic()
+        logger.info(f"작업자 {index} 시작 (PID: {pid})")
+        return pid
+
+    def _run_child(self, index):
+        code = 0
+        try:
+            # 관리자의 시그널 처리기를 물려받지 않도록 기본값으로 되돌림 (작업자가 직접 설정)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            watch_parent()
+            self.target(index)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            logger.exception(f"작업자 {index} 실행 중 오류")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _handle_stop(self, signum, frame):
+        if not self._stopping:
+            logger.info(f"종료 시그널 수신 ({signal.Signals(signum).name}) - 작업자 종료 대기")
+        self._stopping = True
+
+    def _reap(self):
+        """종료된 작업자를 정리하고 [(번호, 종료 설명)] 반환"""
+        exited = []
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            index = self.pids.pop(pid, None)
+            if index is None:
+                continue
+            if os.WIFSIGNALED(status):
+                reason = f"시그널 {signal.Signals(os.WTERMSIG(status)).name}"
+            else:
+                reason = f"종료 코드 {os.WEXITSTATUS(status)}"
+            exited.append((index, pid, reason))
+        return exited
+
+    def _schedule_restart(self, index, pid, reason):
+        uptime = time.monotonic() - self._started_at.get(index, 0.0)
+        if uptime < self.min_uptime:
+            # 시작하자마자 종료되면 (설정 오류 등) 재시작 간격을 늘려 CPU 를 낭비하지 않음
+            delay = min(self._delays.get(index, self.restart_delay / 2) * 2, self.max_restart_delay)
+        else:
+            delay = self.restart_delay
+        self._delays[index] = delay
+        self._pending[index] = time.monotonic() + delay
+        self.restarts += 1
+        logger.warning(f"작업자 {index} (PID: {pid}) 가 {reason} 로 종료됨 - {delay:.1f}초 후 다시 시작")
+
+    def run(self):
+        """작업자를 시작하고 종료 시그널을 받을 때까지 감시"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while not self._stopping:
+            for index, pid, reason in self._reap():
+                self._schedule_restart(index, pid, reason)
+            now = time.monotonic()
+            for index, due in list(self._pending.items()):
+                if due <= now and not self._stopping:
+                    del self._pending[index]
+                    self.spawn(index)
+            time.sleep(0.2)
+
+        self.drain()
+
+    def drain(self):
+        """모든 작업자에 SIGTERM 을 보내고 종료를 기다림 (시간이 지나면 SIGKILL)"""
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        # 작업자 쪽 대기 시간보다 조금 더 기다림
+        deadline = time.monotonic() + self.drain_timeout + 5.0
+        while self.pids and time.monotonic() < deadline:
+            for index, pid, reason in self._reap():
+                logger.info(f"작업자 {index} (PID: {pid}) 종료 - {reason}")
+            time.sleep(0.1)
+
+        for pid, index in list(self.pids.items()):
+            logger.warning(f"작업자 {index} (PID: {pid}) 가 제한 시간 안에 끝나지 않아 강제 종료")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.pids.pop(pid, None)
+        logger.info("모든 작업자 종료")
+
+def watch_parent(interval=1.0):
+    """관리자 프로세스가 강제 종료되어 부모가 바뀌면 스스로 SIGTERM 을 보내 종료"""
+    parent = os.getppid()
+
+    def check():
+        while True:
+            time.sleep(interval)
+            if os.getppid() != parent:
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    threading.Thread(target=check, name='parent-watch', daemon=True).start()